@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+
+'''
+jslatency.py - Compares input latency of the native Linux joystick backend with pygame's
+
+    Copyright (C) 2014 Simon D. Levy
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+Usage: jslatency.py [DEVICE] [SECONDS]
+
+Reads the same joystick through pygame and through DEVICE (default /dev/input/js0) side by side
+while you move the sticks.  For each axis change, reports how much earlier the native backend saw
+it than pygame did, and how long a read takes on each path.  For evdev nodes, also reports the
+latency from the kernel's event timestamp to the read.
+'''
+
+import os
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+from quadstick.linux import open_device
+
+def percentile(values, p):
+
+    values = sorted(values)
+
+    return values[min(int(p / 100. * len(values)), len(values)-1)] if values else float('nan')
+
+if __name__ == '__main__':
+
+    path = sys.argv[1] if len(sys.argv) > 1 else '/dev/input/js0'
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    pygame.display.init()
+    pygame.joystick.init()
+    js = pygame.joystick.Joystick(0)
+    js.init()
+
+    native = open_device(path)
+
+    numaxes = min(js.get_numaxes(), native.get_numaxes())
+
+    # Time at which each path first showed each value of each axis
+    seen_native = [{} for k in range(numaxes)]
+    seen_pygame = [{} for k in range(numaxes)]
+
+    native_reads = []
+    pygame_reads = []
+    kernel = []
+
+    print('Move the sticks for %d seconds ...' % seconds)
+
+    end = time.monotonic() + seconds
+
+    while time.monotonic() < end:
+
+        native.latency = None
+
+        start = time.monotonic()
+        native.update()
+        now = time.monotonic()
+        native_reads.append(now - start)
+
+        for k in range(numaxes):
+            seen_native[k].setdefault(round(native.get_axis(k), 3), now)
+
+        if native.latency is not None:
+            kernel.append(native.latency)
+
+        start = time.monotonic()
+        pygame.event.pump()
+        values = [js.get_axis(k) for k in range(numaxes)]
+        now = time.monotonic()
+        pygame_reads.append(now - start)
+
+        for k in range(numaxes):
+            seen_pygame[k].setdefault(round(values[k], 3), now)
+
+    # Positive differences mean the native backend saw a value first
+    lead = []
+    for k in range(numaxes):
+        for value, t in seen_pygame[k].items():
+            if value in seen_native[k]:
+                lead.append(t - seen_native[k][value])
+
+    print('Read cost (usec)    p50 %8.1f  p99 %8.1f  native' %
+            (percentile(native_reads, 50)*1e6, percentile(native_reads, 99)*1e6))
+    print('                    p50 %8.1f  p99 %8.1f  pygame' %
+            (percentile(pygame_reads, 50)*1e6, percentile(pygame_reads, 99)*1e6))
+    print('Native lead (msec)  p50 %8.3f  p99 %8.3f  over %d changes' %
+            (percentile(lead, 50)*1e3, percentile(lead, 99)*1e3, len(lead)))
+
+    if kernel:
+        print('Kernel->read (msec) p50 %8.3f  p99 %8.3f' % (percentile(kernel, 50)*1e3, percentile(kernel, 99)*1e3))
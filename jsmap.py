@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+
+'''
+jsmap.py - Works out a controller's axis and button mapping and saves it for QuadStick
+
+    Copyright (C) 2014 Simon D. Levy
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+Asks you to work each stick and the mode switch in turn, watches which axis or button moves, and
+saves the result under the device's GUID and name (see quadstick.mapping).  From then on, any
+QuadStick controller opened on that device uses it.  Signs follow the convention of a joystick
+read through SDL: stick forward gives negative pitch, stick right gives negative roll, yaw right
+gives positive yaw, and full throttle gives a throttle of one.
+'''
+
+import argparse
+import json
+import time
+
+import pygame
+
+from quadstick import mapping
+
+# Seconds to watch each control
+WATCH = 4
+
+# Smallest movement, in axis units, that counts
+MOVED = .5
+
+# Attribute prefix, instructions, and the sign the movement asked for should read as
+CONTROLS = (
+        ('throttle', 'Move the THROTTLE from idle to full, then back to idle.', +1),
+        ('pitch', 'Push the PITCH stick fully forward, then let it return to center.', -1),
+        ('roll', 'Push the ROLL stick fully right, then let it return to center.', -1),
+        ('yaw', 'Push the YAW stick fully right, then let it return to center.', +1),
+        )
+
+def read(js):
+
+    return [js.get_axis(k) for k in range(js.get_numaxes())], [js.get_button(k) for k in range(js.get_numbuttons())]
+
+def watch(js, seconds):
+    '''
+    Returns the furthest each axis moved in either direction, and the buttons that changed, over the
+    given time.
+    '''
+    axes, buttons = read(js)
+
+    lowest = list(axes)
+    highest = list(axes)
+    pressed = set()
+
+    deadline = time.monotonic() + seconds
+
+    while True:
+
+        remaining = deadline - time.monotonic()
+
+        if remaining <= 0:
+            break
+
+        # Sleep until something moves
+        pygame.event.wait(int(remaining * 1000) + 1)
+        pygame.event.clear()
+
+        values, states = read(js)
+
+        for k, value in enumerate(values):
+            lowest[k] = min(lowest[k], value)
+            highest[k] = max(highest[k], value)
+
+        pressed.update(k for k, state in enumerate(states) if state != buttons[k])
+
+    return [(low - axes[k], high - axes[k]) for k, (low, high) in enumerate(zip(lowest, highest))], pressed
+
+def choose(movements, taken):
+    '''
+    Returns the axis that moved furthest among those not taken, with the signed extreme of its
+    movement, or None if no axis moved enough.
+    '''
+    best = None
+
+    for k, (low, high) in enumerate(movements):
+
+        if k in taken:
+            continue
+
+        extreme = low if -low > high else high
+
+        if abs(extreme) >= MOVED and (best is None or abs(extreme) > abs(best[1])):
+            best = k, extreme
+
+    return best
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Map a controller\'s axes and switch for QuadStick')
+    parser.add_argument('index', type=int, nargs='?', default=0, help='pygame joystick index')
+    parser.add_argument('--path', help='mappings file (default %s)' % mapping.default_path())
+    args = parser.parse_args()
+
+    pygame.display.init()
+    pygame.joystick.init()
+    js = pygame.joystick.Joystick(args.index)
+    js.init()
+
+    key = mapping.key(js)
+
+    print('Mapping %s (%d axes, %d buttons)' % (key, js.get_numaxes(), js.get_numbuttons()))
+
+    input('\nCenter the sticks, set the throttle to idle and the mode switch to its first position, '
+        'then hit Enter.')
+
+    result = {}
+    taken = set()
+
+    for name, instructions, sign in CONTROLS:
+
+        while True:
+
+            input('\n%s\nHit Enter, then you have %d seconds.' % (instructions, WATCH))
+
+            movements, _ = watch(js, WATCH)
+
+            found = choose(movements, taken)
+
+            if found is not None:
+                break
+
+            print('Nothing moved far enough; try again.')
+
+        axis, extreme = found
+
+        result[name + '_axis'] = axis
+        result[name + '_sign'] = sign if extreme > 0 else -sign
+
+        taken.add(axis)
+
+        print('%s is axis %d, sign %+d' % (name.capitalize(), axis, result[name + '_sign']))
+
+    while True:
+
+        input('\nFlip the MODE SWITCH through all its positions and back to the first.\n'
+            'Hit Enter, then you have %d seconds.' % WATCH)
+
+        movements, pressed = watch(js, WATCH)
+
+        found = choose(movements, taken)
+
+        if found is not None:
+            result['switch_axis'] = found[0]
+            print('Switch is axis %d' % found[0])
+            break
+
+        if pressed:
+            result['switch_button'] = min(pressed)
+            print('Switch is button %d' % min(pressed))
+            break
+
+        print('Nothing moved far enough; try again.')
+
+    mapping.save(key, result, args.path)
+
+    print('\nSaved to %s:\n%s' % (args.path or mapping.default_path(), json.dumps(result, indent=4, sort_keys=True)))
@@ -28,7 +28,10 @@ if __name__ == "__main__":
             
     while True:
 
-        pygame.event.pump()   
+        # Sleep until the joystick moves, then catch up on everything that happened meanwhile
+        if pygame.event.wait().type == pygame.QUIT:
+            break
+        pygame.event.clear()
                 
         for k in range(js.get_numaxes()):
             sys.stdout.write('A%d: %+3.3f ' % (k, js.get_axis(k)))
@@ -44,4 +47,5 @@ if __name__ == "__main__":
             sys.stdout.write('H%d: %d ' % (k, js.get_hat(k)[1]))
 
         sys.stdout.write('\r')
+        sys.stdout.flush()
           
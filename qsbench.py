@@ -0,0 +1,414 @@
+#!/usr/bin/env python
+
+'''
+qsbench.py - PyQuadStick benchmark suite
+
+    Copyright (C) 2014 Simon D. Levy
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+Runs every controller class without hardware, using a scripted mock joystick (or synthetic key
+events for the keyboard) and SDL's dummy video driver, with the HUD shown on every poll, with
+the HUD capped at 30 frames per second, and headless.  For each, reports polls per second,
+poll latency percentiles, and bytes allocated per poll.  Use --json to save the results for
+comparison across releases.
+
+With --startup, instead times importing quadstick and constructing each controller, each in a
+fresh process, and checks them against the startup budget.  The time taken to import pygame
+itself is reported separately, since it depends on what else is installed.
+
+With --calibration, instead compares the cost per sample of converting R/C channels with each
+transmitter's own conversion, and through calibration lookup tables one sample at a time and in
+blocks (needs NumPy).
+
+With --alloc, instead measures the bytes allocated per headless poll once the sticks have settled,
+by poll() and by poll_into() with each kind of buffer, and fails if poll_into() allocates anything.
+'''
+
+import os
+
+# Run anywhere, with or without a display
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import argparse
+import array
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import pygame
+import pygame.locals
+
+from quadstick import ExtremePro3D, PS3, Sample
+from quadstick.keyboard import Keyboard
+from quadstick.rc.frsky import Taranis
+from quadstick.rc.spektrum import DX8
+from quadstick.mock import MockJoystick
+from quadstick.stats import Histogram
+
+CONTROLLERS = {
+        'ExtremePro3D': ExtremePro3D,
+        'PS3': PS3,
+        'Taranis': Taranis,
+        'DX8': DX8,
+        'Keyboard': Keyboard,
+        }
+
+HUDS = {
+        'hud': {},
+        'hud30': {'hud_fps': 30},
+        'headless': {'headless': True},
+        }
+
+# Startup budget in milliseconds: importing quadstick, and constructing a controller once pygame
+# is imported
+IMPORT_BUDGET = 20
+CONSTRUCT_BUDGET = {
+        'hud': 250,
+        'hud30': 250,
+        'headless': 50,
+        }
+
+# Run in a fresh process for each controller, so nothing is already imported or initialized
+STARTUP = '''
+import sys, time
+start = time.perf_counter()
+import quadstick
+imported = time.perf_counter()
+assert 'pygame' not in sys.modules, 'importing quadstick imported pygame'
+import pygame
+from quadstick.keyboard import Keyboard
+from quadstick.mock import MockJoystick
+from quadstick.rc.frsky import Taranis
+from quadstick.rc.spektrum import DX8
+loaded = time.perf_counter()
+kwargs = %r
+if %r != 'Keyboard':
+    kwargs['device'] = MockJoystick(numaxes=10)
+constructing = time.perf_counter()
+controller = getattr(quadstick, %r, None) or locals()[%r]
+controller(('0', '1', '2'), **kwargs)
+done = time.perf_counter()
+print('%%f %%f %%f' %% (imported - start, loaded - imported, done - constructing))
+'''
+
+# Keys pressed and released in turn to drive the keyboard controller
+KEYS = (pygame.locals.K_UP, pygame.locals.K_w, pygame.locals.K_a, pygame.locals.K_RIGHT, pygame.locals.K_LALT)
+
+class Driver(object):
+    '''
+    Moves a controller's input on by one step per poll, unless idle, when the sticks are left alone.
+    '''
+
+    def __init__(self, name, idle=False, **kwargs):
+
+        self.joystick = None
+
+        self.idle = idle
+
+        if name == 'Keyboard':
+            self.controller = Keyboard(('0', '1', '2'), **kwargs)
+        else:
+            self.joystick = MockJoystick(numaxes=10)
+            self.controller = CONTROLLERS[name](('0', '1', '2'), device=self.joystick, **kwargs)
+
+        # The mock can't make every controller's startup gesture
+        self.controller.ready = True
+
+        self.step = 0
+
+    def advance(self):
+
+        if self.idle:
+            return
+
+        if self.joystick is not None:
+            self.joystick.advance()
+
+        # Press or release a key every 25 polls
+        elif self.step % 25 == 0:
+            key = KEYS[(self.step // 50) % len(KEYS)]
+            kind = pygame.locals.KEYDOWN if self.step % 50 == 0 else pygame.locals.KEYUP
+            pygame.event.post(pygame.event.Event(kind, key=key, mod=0, unicode='', scancode=0))
+
+        self.step += 1
+
+    def close(self):
+
+        if self.controller.renderer is not None:
+            self.controller.renderer.close()
+
+def bench(name, hud, polls, idle=False):
+
+    driver = Driver(name, idle, **HUDS[hud])
+
+    controller = driver.controller
+
+    for k in range(polls // 10):
+        driver.advance()
+        controller.poll()
+
+    # Throughput
+    start = time.perf_counter()
+    for k in range(polls):
+        driver.advance()
+        controller.poll()
+    rate = polls / (time.perf_counter() - start)
+
+    # Latency of each poll
+    histogram = Histogram()
+    clock = time.perf_counter_ns
+    for k in range(polls):
+        driver.advance()
+        t = clock()
+        controller.poll()
+        histogram.record(clock() - t)
+
+    # Memory allocated during each poll, and memory kept afterwards
+    count = min(polls, 2000)
+    tracemalloc.start()
+    allocated = 0
+    before = tracemalloc.get_traced_memory()[0]
+    for k in range(count):
+        driver.advance()
+        tracemalloc.reset_peak()
+        controller.poll()
+        # Read both at once afterwards, since the numbers returned are allocations themselves
+        current, peak = tracemalloc.get_traced_memory()
+        allocated += peak - current
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    driver.close()
+
+    return {
+            'controller': name,
+            'hud': hud,
+            'polls': polls,
+            'idle': idle,
+            'polls_per_sec': rate,
+            'latency_us': histogram.summary(),
+            'alloc_bytes_per_poll': float(allocated) / count,
+            'retained_bytes_per_poll': float(retained) / count,
+            }
+
+def startup(name, hud):
+
+    env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT='1')
+
+    script = STARTUP % (HUDS[hud], name, name, name)
+
+    output = subprocess.check_output([sys.executable, '-c', script], env=env)
+
+    seconds = [float(value) for value in output.split()]
+
+    return {
+            'controller': name,
+            'hud': hud,
+            'import_ms': seconds[0] * 1e3,
+            'pygame_import_ms': seconds[1] * 1e3,
+            'construct_ms': seconds[2] * 1e3,
+            'within_budget': seconds[0] * 1e3 <= IMPORT_BUDGET and seconds[2] * 1e3 <= CONSTRUCT_BUDGET[hud],
+            }
+
+def calibration(samples, block=1000):
+
+    from quadstick.rc.calibration import Calibration
+
+    import numpy as np
+
+    # A profile with every kind of correction on the sticks
+    stick = {'center': .01, 'min': -.64, 'max': .68, 'deadband': .03, 'expo': .3, 'rate': .9}
+    profile = {'channels': dict((str(index), stick) for index in range(4))}
+
+    results = []
+
+    for name in ('Taranis', 'DX8'):
+
+        controller = CONTROLLERS[name](('0', '1', '2'), device=MockJoystick(numaxes=8), headless=True)
+
+        table = Calibration(profile)
+        table.build(controller.numaxes, controller._convert_axis)
+
+        rows = [MockJoystick(numaxes=8).script(step, 8, 0)[0] for step in range(samples)]
+        array = np.array(rows)
+
+        convert = controller._convert_axis
+
+        start = time.perf_counter()
+        for row in rows:
+            [convert(index, value) for index, value in enumerate(row)]
+        scalar = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for row in rows:
+            table.apply(row)
+        single = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for index in range(0, samples, block):
+            table.apply_batch(array[index:index+block])
+        batch = time.perf_counter() - start
+
+        results.append({
+            'controller': name,
+            'samples': samples,
+            'scalar_us': scalar / samples * 1e6,
+            'table_us': single / samples * 1e6,
+            'table_batch_us': batch / samples * 1e6,
+            })
+
+    return results
+
+def allocations(name, polls):
+
+    driver = Driver(name, True, headless=True)
+
+    controller = driver.controller
+
+    buffers = [('array', array.array('d', [0.] * 5)), ('Sample', Sample())]
+
+    try:
+        import numpy as np
+        buffers.append(('numpy', np.zeros(5)))
+    except ImportError:
+        pass
+
+    calls = [('poll', controller.poll)]
+    calls.extend(('poll_into(%s)' % kind, lambda buf=buf: controller.poll_into(buf)) for kind, buf in buffers)
+
+    result = {'controller': name, 'polls': polls}
+
+    tracemalloc.start()
+
+    for label, call in calls:
+
+        # The first polls settle the input and fill any caches
+        for k in range(polls):
+            call()
+
+        allocated = 0
+        for k in range(polls):
+            tracemalloc.reset_peak()
+            call()
+            current, peak = tracemalloc.get_traced_memory()
+            allocated += peak - current
+
+        result[label] = float(allocated) / polls
+
+    tracemalloc.stop()
+
+    return result
+
+def report(args, results):
+
+    report = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'pygame': pygame.version.ver,
+            'platform': platform.platform(),
+            'video_driver': os.environ['SDL_VIDEODRIVER'],
+            'results': results,
+            }
+
+    if args.json == '-':
+        json.dump(report, sys.stdout, indent=2)
+    else:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Benchmark PyQuadStick controllers')
+    parser.add_argument('--polls', type=int, default=10000, help='polls per measurement')
+    parser.add_argument('--controllers', nargs='+', default=sorted(CONTROLLERS), choices=sorted(CONTROLLERS))
+    parser.add_argument('--hud', nargs='+', default=['hud', 'hud30', 'headless'], choices=sorted(HUDS))
+    parser.add_argument('--json', metavar='FILE', help='write results as JSON to FILE (- for stdout)')
+    parser.add_argument('--idle', action='store_true', help='leave the sticks alone while polling')
+    parser.add_argument('--startup', action='store_true', help='time startup against its budget instead')
+    parser.add_argument('--calibration', action='store_true', help='time R/C channel conversion instead')
+    parser.add_argument('--alloc', action='store_true', help='measure allocation by settled polls instead')
+    args = parser.parse_args()
+
+    results = []
+
+    if args.alloc:
+
+        for name in args.controllers:
+
+            result = allocations(name, min(args.polls, 2000))
+
+            labels = [label for label in sorted(result) if label.startswith('poll') and label != 'polls']
+
+            if not results:
+                print('%-13s' % 'bytes/poll' + ''.join(' %18s' % label for label in labels))
+
+            print('%-13s' % name + ''.join(' %18.1f' % result[label] for label in labels))
+
+            results.append(result)
+
+        if args.json:
+            report(args, results)
+
+        sys.exit(0 if all(result[label] == 0 for result in results for label in result
+            if label.startswith('poll_into')) else 1)
+
+    if args.calibration:
+
+        print('%-13s %10s %10s %10s' % ('controller', 'scalar us', 'table us', 'batch us'))
+
+        results = calibration(args.polls)
+
+        for result in results:
+            print('%-13s %10.3f %10.3f %10.3f' % (result['controller'], result['scalar_us'], result['table_us'],
+                result['table_batch_us']))
+
+        if args.json:
+            report(args, results)
+
+        sys.exit(0)
+
+    if args.startup:
+
+        print('%-13s %-9s %10s %10s %12s %8s' % ('controller', 'hud', 'import ms', 'pygame ms', 'construct ms',
+            'budget'))
+
+        for name in args.controllers:
+            for hud in args.hud:
+                result = startup(name, hud)
+                print('%-13s %-9s %10.2f %10.2f %12.2f %8s' % (name, hud, result['import_ms'],
+                    result['pygame_import_ms'], result['construct_ms'], 'ok' if result['within_budget'] else 'OVER'))
+                sys.stdout.flush()
+                results.append(result)
+
+        if args.json:
+            report(args, results)
+
+        sys.exit(0 if all(result['within_budget'] for result in results) else 1)
+
+    print('%-13s %-9s %12s %9s %9s %9s %11s' % ('controller', 'hud', 'polls/sec', 'p50 us', 'p99 us', 'p999 us',
+        'bytes/poll'))
+
+    for name in args.controllers:
+        for hud in args.hud:
+            result = bench(name, hud, args.polls, args.idle)
+            latency = result['latency_us']
+            print('%-13s %-9s %12.0f %9.2f %9.2f %9.2f %11.1f' % (name, hud, result['polls_per_sec'],
+                latency['p50'], latency['p99'], latency['p999'], result['alloc_bytes_per_poll']))
+            sys.stdout.flush()
+            results.append(result)
+
+    if args.json:
+        report(args, results)
@@ -15,45 +15,328 @@ quadstick/__init__.py - Python class for polling quadcopter flight-simulator con
 
 '''
 
-import pygame
-import pygame.locals
-from platform import platform
+import os
+import select
 import sys
-import traceback
+import time
 
-class QuadStick(object):
+# pygame is imported by the first controller created, so that importing quadstick stays cheap
+pygame = None
 
-    def __init__(self, name, switch_labels):
+def _import_pygame():
+
+    global pygame
+
+    import pygame
+    import pygame.locals
+
+_system = None
+
+def _platform():
+
+    # Operating system name, worked out once per process
+    global _system
+
+    if _system is None:
+        import platform
+        _system = platform.system()
+
+    return _system
+
+def _quits(events):
+
+    # Whether any of the events ends a run: QUIT, from closing the window or from SIGINT or SIGTERM, or ESC
+    for event in events:
+        if event.type == pygame.locals.QUIT:
+            return True
+        if event.type == pygame.locals.KEYDOWN and event.key == pygame.locals.K_ESCAPE:
+            return True
+
+    return False
+
+class Sample(object):
+    '''
+    A sample with named fields, for poll_into() to fill in.  Unpacks like the tuple poll() returns.
+    '''
+
+    __slots__ = ('pitch', 'roll', 'yaw', 'throttle', 'switchval', 'timestamp')
+
+    def __init__(self, pitch=0., roll=0., yaw=0., throttle=0., switchval=0, timestamp=None):
+
+        self.pitch = pitch
+        self.roll = roll
+        self.yaw = yaw
+        self.throttle = throttle
+        self.switchval = switchval
+        self.timestamp = timestamp
+
+    def __iter__(self):
+
+        return iter((self.pitch, self.roll, self.yaw, self.throttle, self.switchval))
+
+    def __repr__(self):
+
+        return 'Sample(pitch=%+.3f, roll=%+.3f, yaw=%+.3f, throttle=%.3f, switchval=%d, timestamp=%r)' % (
+                self.pitch, self.roll, self.yaw, self.throttle, self.switchval, self.timestamp)
+
+
+class _Poller(object):
+    '''
+    What QuadStick and quadstick.multi.Manager share: taking events off pygame's queue, waiting
+    for input, the startup, and the window.  Subclasses pass events to their devices with
+    _input(events), name any devices that can be waited on with _filenos(), and make the startup
+    gesture with _starting().
+    '''
+
+    def _init_events(self):
+
+        # Supports keyboard polling
+        self.keys = []
+
+        # Events captured by polling, held for the next call to running()
+        self.events = []
+
+        # SDL's event and video calls aren't thread-safe, so with a render thread, take events under
+        # its lock
+        self.event_lock = self.renderer.lock if self.renderer is not None and self.renderer.thread else None
+
+        self.stopped = False
+
+    def running(self):
+        '''
+        Returns True while running, and False once ESC is hit, the window is closed, an interrupt
+        signal arrives, or stop() is called.
+        '''
+        self._pump()
+
+        self.keys = self.events
+        self.events = []
+
+        # With no window there are no resize or ESC events; SDL still turns SIGINT/SIGTERM into QUIT
+        for event in self.keys:
+
+            if event.type == pygame.locals.QUIT:
+                return False
+
+            elif event.type == pygame.locals.VIDEORESIZE and self.hud is not None:
+                with self.renderer.lock:
+                    self.hud.resize((event.w, event.h))
+
+            elif (event.type == pygame.locals.KEYDOWN and event.key == pygame.locals.K_ESCAPE):
+                return False
+
+        return not self.stopped
+
+    def detach(self, sink):
+        '''
+        Stops passing samples to sink.
+        '''
+        self.sinks.remove(sink)
+
+    def stop(self):
+        '''
+        Makes running() return False on its next call.  This is the way to end a headless run from code.
+        '''
+        self.stopped = True
+
+    def message(self, msg):
+        '''
+        Displays a message.
+        '''
+        if self.hud is None:
+            print(msg)
+            return
+
+        with self.renderer.lock:
+            self.hud.message(msg)
+
+    def clear(self):
+        '''
+        Clears the display.
+        '''
+        if self.hud is not None:
+            with self.renderer.lock:
+                self.hud.clear()
+
+    def error(self):
+        '''
+        Displays the most recent exception as an error message, and waits for ESC to quit.
+        In headless mode, or with no HUD, the error goes to stderr and the program exits immediately.
+        '''
+        import traceback
+
+        if self.hud is None:
+            sys.stderr.write(traceback.format_exc())
+            pygame.quit()
+            sys.exit(1)
+
+        self.renderer.close()
+
+        msg = traceback.format_exc()
+
+        self.hud.error(msg)
+
+        while self.running():
+
+            # Redraw only when the window needs it
+            if any(event.type in (pygame.locals.VIDEORESIZE, pygame.locals.VIDEOEXPOSE) for event in self.keys):
+                self.hud.error(msg)
+
+            self._wait()
+
+        pygame.quit()
+        sys.exit()
+
+    def _pump(self):
+
+        if self.event_lock is None:
+            self._take(pygame.event.get())
+            return
+
+        with self.event_lock:
+            events = pygame.event.get()
+
+        self._take(events)
+
+    def _take(self, events):
+
+        self._input(events)
+
+        # Keep events for running(), but don't let them pile up if it's never called
+        self.events.extend(events)
+        del self.events[:-256]
+
+    def _wait(self):
+
+        # Sleep until a device has input or an event arrives, for at most WAIT seconds
+        filenos = self._filenos()
+
+        if filenos is not None:
+            select.select(filenos, [], [], self.WAIT)
+            return
+
+        if self.event_lock is None:
+            event = pygame.event.wait(int(self.WAIT * 1000))
+        else:
+            with self.event_lock:
+                event = pygame.event.wait(int(self.WAIT * 1000))
+
+        if event.type != pygame.locals.NOEVENT:
+            self._take([event])
+
+    def _startup(self):
+
+        # Making the generator allocates, so only once there's a startup to wait for
+        if not self.ready:
+            for _ in self._starting():
+                self._wait()
+
+    def _interrupted(self):
+
+        # Events stay queued for running(), which ends the run on them too
+        return self.stopped or _quits(self.events)
+
+
+class QuadStick(_Poller):
+
+    # Whether the demands stay put while the input does; see poll()
+    STEADY = True
+
+    # Whether the first poll() waits for the startup gesture
+    GESTURE = True
+
+    def __init__(self, name, switch_labels, headless=False, hud_fps=None, hud_every=None, render_thread=True,
+            clock=None, device=None, hud=True, mapping=None, joystick_events=True, history=None):
         '''
-        Creates a new QuadStick object.
+        Creates a new QuadStick object.  If headless is True, no window is opened and poll()
+        just pumps input and returns the demands.  Otherwise the HUD shows every sample, unless
+        hud_fps caps its frame rate or hud_every shows only every Nth sample.  A capped HUD is drawn
+        on its own thread if render_thread is True and the platform allows it.
+        Samples are timed by clock, a function returning seconds, which defaults to the monotonic
+        wall clock; a simulator can pass its own time instead.
+        The first pygame joystick is read unless device gives the index of another, a joystick-like
+        object to read instead, or the path of a Linux joydev or evdev node (see quadstick.linux).
+        A pygame joystick's state is kept up to date from its events, unless joystick_events is False
+        (for programs that take events off pygame's queue themselves), when it is read on every poll.
+        With hud False there is no window of this controller's own, as when a quadstick.multi.Manager
+        shows several controllers together.
+        Axes and signs come from the mapping saved for the device by jsmap.py, if any, or else from
+        the built-in mapping for the platform; mapping gives a dictionary to use instead (see
+        quadstick.mapping).
+        With history, the last history samples are kept for sample_at().
         '''
 
         # Set constants
         self.BAND = 0.2 # Must be these close to neutral for hold / autopilot
+        self.WAIT = 0.1 # Longest sleep, in seconds, while waiting for input on startup or error
 
-        # Init pygame
-        pygame.init()
-        pygame.display.init()
-        
-        self.screen = pygame.display.set_mode((500,280), pygame.locals.RESIZABLE)
-        self.font = pygame.font.SysFont('Courier', 20)
-        pygame.display.set_caption('QuadStick: ' + name)
+        self.headless = headless
 
-        # Supports keyboard polling
-        self.keys = []
+        # SDL still needs a video driver to deliver input events, but it doesn't need a real one; with
+        # no window to have focus, it must be told to deliver joystick input anyway
+        if headless:
+            os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+            os.environ.setdefault('SDL_JOYSTICK_ALLOW_BACKGROUND_EVENTS', '1')
+
+        # Init only what we need: the display delivers events even when there's no window to show
+        _import_pygame()
+        pygame.display.init()
 
         self.name = name
 
-        self.platform = platform()[0:platform().find('-')]
+        self.platform = _platform()
 
-        self.row_height = 30
+        self.hud = None
+        self.renderer = None
+
+        if not headless and hud:
+            from quadstick.hud import HUD, Renderer
+            self.hud = HUD(name, switch_labels)
+            # OS X only allows drawing from the main thread
+            self.renderer = Renderer(self.hud, hud_fps, hud_every, render_thread and self.platform != 'Darwin')
+
+        self._init_events()
 
         self.paused = False
 
-        pygame.joystick.init()
-        self.joystick = pygame.joystick.Joystick(0)
-        self.joystick.init()
-        self.joystick.get_axis(0)
+        self.clock = clock or time.monotonic
+
+        # Time of the latest snapshot, and seconds since the one before it
+        self.timestamp = None
+        self.dt = 0.
+
+        self.device = device
+        self.joystick = None
+
+        self.joystick_events = joystick_events
+
+        self.mapping = mapping
+
+        # Objects with a write(timestamp, sample, axes) method, given every sample
+        self.sinks = []
+
+        # Worker thread for asyncio access, started when first needed
+        self.executor = None
+
+        # Per-stage timing, when enabled by profile()
+        self.profiler = None
+
+        # Filters for the demands, when set by set_filters()
+        self.filters = None
+
+        # Recent samples for sample_at(), kept like any other sink's
+        self.history = None
+
+        if history:
+            from quadstick.predict import History
+            self.history = History(history)
+            self.sinks.append(self.history)
+
+        # Latest sample from poll(), and whether the latest snapshot left it as it was
+        self.sample = None
+        self.idle = False
+
+        self._init_device()
 
         self.ready = False
 
@@ -66,204 +349,462 @@ class QuadStick(object):
         '''
         return self.name
 
-    def _pump(self):
+    def _init_device(self):
 
-        pygame.event.pump()   
+        # Joystick whose events we follow, if any
+        self._instance = None
 
+        if self.device is None or isinstance(self.device, int):
+            pygame.joystick.init()
+            self.joystick = pygame.joystick.Joystick(self.device or 0)
+            if self.joystick_events:
+                self._instance = self.joystick.get_instance_id()
 
-    def _startup(self):
+        elif isinstance(self.device, str):
+            from quadstick.linux import open_device
+            self.joystick = open_device(self.device)
 
-        if not self.ready:
+        else:
+            self.joystick = self.device
 
-            self.message(self._startup_message())
+        self.joystick.init()
 
-            while True:
-                self._pump()
-                if self._get_throttle()  > .5:
-                    break
+        # Devices that keep their own state can hand it over all at once
+        self._device_snapshot = getattr(self.joystick, 'snapshot', None)
 
-            while True:
-                self._pump()
-                if self._get_throttle()  < .05 and self._get_switchval() == 0:
-                    break
+        joystick = self.joystick
 
-            self.clear()
+        self.numaxes = joystick.get_numaxes()
+        self.numbuttons = joystick.get_numbuttons()
+        self.numhats = joystick.get_numhats() if hasattr(joystick, 'get_numhats') else 0
 
-            self.ready = True
+        # Events only report changes, so start from the joystick's state now
+        self.axes = [joystick.get_axis(k) for k in range(self.numaxes)]
+        self.buttons = [joystick.get_button(k) for k in range(self.numbuttons)]
+        self.hats = [joystick.get_hat(k) for k in range(self.numhats)]
 
-    def poll(self):
+        # What changed since the last snapshot; everything, to begin with
+        self.changed_axes = set(range(self.numaxes))
+        self.changed_buttons = set(range(self.numbuttons))
+        self.changed_hats = set(range(self.numhats))
+
+    def _init_state(self, numaxes=0):
+
+        # State for a controller with no joystick to open: numaxes axes at zero, and nothing changed
+        self.numaxes = numaxes
+        self.numbuttons = self.numhats = 0
+
+        self.axes = [0.] * numaxes
+        self.buttons = []
+        self.hats = []
+
+        self._instance = None
+
+        self.changed_axes = set()
+        self.changed_buttons = set()
+        self.changed_hats = set()
+
+    def _map(self, mappings):
+
+        # The built-in mapping for this platform (Linux by default), then the device's own
+        values = dict(mappings.get(self.platform, mappings['Linux']))
+
+        own = self.mapping
 
+        if own is None and self.joystick is not None:
+            from quadstick.mapping import lookup
+            own = lookup(self.joystick)
+
+        # The device's switch replaces the built-in one, whether on an axis or a button
+        if own and ('switch_axis' in own or 'switch_button' in own):
+            values.pop('switch_axis', None)
+            values.pop('switch_button', None)
+
+        values.update(own or {})
+
+        self.switch_axis = self.switch_button = None
+
+        for name, value in values.items():
+            setattr(self, name, value)
+
+    def _snapshot(self):
+
+        # Capture events, axes and buttons exactly once, so all demands come from the same sample
         self._pump()
+        self._sample()
 
-        self._startup()
+    def _sample(self):
 
-        demands = self._get_pitch(), self._get_roll(), self._get_yaw(), self._get_throttle()
+        self._tick()
+        self._read_device()
+        self._update()
+        self._settle()
 
-        switchval = self._get_switchval()
+    def _settle(self):
 
-        self._show_demand(demands, 0, -1, 'Pitch')
-        self._show_demand(demands, 1, -1, 'Roll')
-        self._show_demand(demands, 2, +1, 'Yaw')
-        self._show_demand(demands, 3, +1, 'Throttle') 
-     
-        self._show_switch(switchval, 0)
-        self._show_switch(switchval, 1)
-        self._show_switch(switchval, 2)
+        # Nothing to recompute if no input changed, unless the demands move by themselves
+        changed = self.changed_axes or self.changed_buttons or self.changed_hats
 
-        pygame.display.flip()
+        self.idle = self.STEADY and self.filters is None and not changed
 
-        return demands[0], demands[1], demands[2], demands[3], switchval
- 
-    def running(self):
-        '''
-        Returns True if the QuadStick is running, False otherwise. Run can be terminated by hitting
-        ESC.
-        '''
+        if changed:
+            self.changed_axes.clear()
+            self.changed_buttons.clear()
+            self.changed_hats.clear()
 
-        self.keys = pygame.event.get()
+    def _tick(self):
 
-        for event in self.keys:
+        now = self.clock()
 
-            if event.type == pygame.locals.QUIT:
-                return False
+        # A clock that steps back gives a zero step; max() would cost an allocation every poll
+        dt = 0. if self.timestamp is None else now - self.timestamp
 
-            elif event.type == pygame.locals.VIDEORESIZE:
-                self.screen = pygame.display.set_mode((event.w, event.h), pygame.locals.RESIZABLE)
+        self.dt = dt if dt > 0. else 0.
 
-            elif (event.type == pygame.locals.KEYDOWN and event.key == pygame.locals.K_ESCAPE):
-                return False
+        self.timestamp = now
 
-        return True
+    def _input(self, events):
 
-    def clear(self):
-        '''
-        Clears the display.
-        '''
-        self.screen.fill((0,0,0))
- 
-    def error(self):
-        '''
-        Displays the most recent exception as an error message, and waits for ESC to quit.
-        '''
-        while True:
+        # Even an empty loop makes an iterator, so skip the loops when there's nothing to follow
+        if not events:
+            return
+
+        if self._instance is not None:
+            self._follow(events)
+
+        self._handle_events(events)
+
+    def _filenos(self):
+
+        fileno = getattr(self.joystick, 'fileno', None)
+
+        return None if fileno is None else [fileno()]
+
+    def _follow(self, events):
+
+        # Apply our joystick's events to its state, noting what changed
+        instance = self._instance
+
+        for event in events:
+
+            kind = event.type
+
+            if kind == pygame.locals.JOYAXISMOTION:
+                if event.instance_id == instance:
+                    self.axes[event.axis] = event.value
+                    self.changed_axes.add(event.axis)
+
+            elif kind == pygame.locals.JOYBUTTONDOWN or kind == pygame.locals.JOYBUTTONUP:
+                if event.instance_id == instance:
+                    self.buttons[event.button] = 1 if kind == pygame.locals.JOYBUTTONDOWN else 0
+                    self.changed_buttons.add(event.button)
+
+            elif kind == pygame.locals.JOYHATMOTION:
+                if event.instance_id == instance:
+                    self.hats[event.hat] = event.value
+                    self.changed_hats.add(event.hat)
+
+    def _handle_events(self, events):
+
+        return
+
+    def _read_device(self):
+
+        # Events have already brought the state up to date
+        if self._instance is not None:
+            return
+
+        if self._device_snapshot is not None:
+            axes, buttons = self._device_snapshot()
+            self._compare(self.axes, axes, self.changed_axes)
+            self._compare(self.buttons, buttons, self.changed_buttons)
+            self.axes, self.buttons = axes, buttons
+            return
+
+        joystick = self.joystick
+
+        # Counting rather than iterating, since every iterator is an allocation and this runs every poll
+        axes = self.axes
+        k = 0
+        while k < self.numaxes:
+            value = joystick.get_axis(k)
+            if value != axes[k]:
+                axes[k] = value
+                self.changed_axes.add(k)
+            k += 1
+
+        buttons = self.buttons
+        k = 0
+        while k < self.numbuttons:
+            value = joystick.get_button(k)
+            if value != buttons[k]:
+                buttons[k] = value
+                self.changed_buttons.add(k)
+            k += 1
+
+        hats = self.hats
+        k = 0
+        while k < self.numhats:
+            value = joystick.get_hat(k)
+            if value != hats[k]:
+                hats[k] = value
+                self.changed_hats.add(k)
+            k += 1
+
+    @staticmethod
+    def _compare(old, new, changed):
+
+        if len(old) != len(new):
+            changed.update(range(len(new)))
+            return
+
+        for k in range(len(new)):
+            if new[k] != old[k]:
+                changed.add(k)
+
+    def _update(self):
+
+        return
+
+    def _starting(self):
+
+        # Yields whenever it needs another sample, so the caller can wait for one its own way
+        if self.GESTURE:
+
+            self.message(self._startup_message())
+
+            yield from self._await_startup(self._snapshot, self._interrupted)
 
             self.clear()
-            tb = traceback.format_exc()
-            self._draw_label_in_row('ERROR', 0, color=(255,0,0))
 
-            self._display(tb)
+        # Given up, the run is over, and running() will say so
+        self.ready = not self._interrupted()
 
-            pygame.display.flip()
+    def _await_startup(self, snapshot, interrupted):
 
-            if not self.running():
-                pygame.quit()
-                sys.exit()
+        # Throttle up, then down with the switch off; snapshot() takes each new sample, and
+        # interrupted() says to give up
+        while not interrupted():
+            snapshot()
+            if self._get_throttle()  > .5:
+                break
+            yield
 
-    def message(self, msg):
+        while not interrupted():
+            snapshot()
+            if self._get_throttle()  < .05 and self._get_switchval() == 0:
+                break
+            yield
+
+    def poll(self):
         '''
-        Displays a message.
+        Returns the latest (pitch, roll, yaw, throttle, switchval).  When idle is True afterwards, no
+        input changed and this is the previous sample, returned without working it out again.
         '''
-        self.clear()
+        if self.profiler is not None:
+            return self._poll_profiled()
+
+        # The gesture takes samples of its own, so the one returned is taken after it
+        self._startup()
 
-        self._display(msg)
+        self._snapshot()
 
-    def _display(self, msg):
+        sample = self._demands()
 
-        row = 1
-        for line in msg.split('\n'):
-            self._draw_label_in_row(line, row)
-            row += 1
+        if self.renderer is not None:
+            self.renderer.submit(sample[:4], sample[4])
 
-        pygame.display.flip()
+        # Iterating even an empty list allocates
+        if self.sinks:
+            for sink in self.sinks:
+                sink.write(self.timestamp, sample, self.axes)
 
-    def _show_switch(self, switchval, index):
+        return sample
 
-        x = 200
-        y = 180 + index * 30
-        r = 10
+    def _demands(self):
 
-        # Draw a white ring around the button
-        pygame.draw.circle(self.screen, (255,255,255), (x, y), r, 1)
+        # The sample from the latest snapshot, worked out again only if the input changed
+        sample = self.sample
 
-        # Draw a white or black disk inside the ring depending on switch state
-        pygame.draw.circle(self.screen, (255,255,255) if switchval == index else (0,0,0), (x, y), r-3)
+        if not self.idle or sample is None:
 
-        self._draw_label(self.switch_labels[index], y-10)
+            demands = self._get_pitch(), self._get_roll(), self._get_yaw(), self._get_throttle()
 
-    def _show_demand(self, demands, index, sign, label):
+            if self.filters is not None:
+                demands = self.filters.step(list(demands), self.dt)
 
-        # color for no-demand baseline
-        color = (0, 0, 255) 
+            sample = self.sample = demands[0], demands[1], demands[2], demands[3], self._get_switchval()
 
-        demand = sign * demands[index]
+        return sample
 
-        if demand > 0:
-            color =  (0, 255, 0)
+    def poll_into(self, buf):
+        '''
+        Like poll(), but writes pitch, roll, yaw, throttle and switchval into buf and returns it.  The
+        buffer is a Sample, which also gets the timestamp, or anything that takes item assignment,
+        such as array.array('d', [0.] * 5), a memoryview of one, or a NumPy array.  Once the input has
+        settled, headless polling this way allocates no memory.
+        '''
+        sample = self.poll()
 
-        if demand < 0:
-            color =  (255, 0, 0)
+        if isinstance(buf, Sample):
+            buf.pitch = sample[0]
+            buf.roll = sample[1]
+            buf.yaw = sample[2]
+            buf.throttle = sample[3]
+            buf.switchval = sample[4]
+            buf.timestamp = self.timestamp
 
-        w = 100			# width of rectangel for maximum demand
-        h = 20
+        else:
+            buf[0] = sample[0]
+            buf[1] = sample[1]
+            buf[2] = sample[2]
+            buf[3] = sample[3]
+            buf[4] = sample[4]
 
-        x = 250
-        y = 20 + index * 30
+        return buf
 
-        # Erase previous 
-        pygame.draw.rect(self.screen, (0,0,0), (x-w-1, y, x-w/2, h))
+    def _poll_profiled(self):
 
-        # Draw a white hollow rectangle to represent the limits
-        pygame.draw.rect(self.screen, (255,255,255), (x-w-1, y, x-w/2, h), 1)
+        # The same as poll(), timing each stage
+        record = self.profiler.record
+        clock = time.perf_counter_ns
 
-        # Special handling for throttle
-        if index == 3:
-            x -= w
-            w += w
+        # Don't count the wait for the startup gesture
+        self._startup()
 
-        # Draw a colorful filled rectangle to represent the demand
-        pygame.draw.rect(self.screen, color, (x, y, demand*w, h))
+        start = t0 = clock()
+
+        self._pump()
+        t1 = clock()
+        record('pump', t1 - t0)
+
+        self._tick()
+        self._read_device()
+        t0 = clock()
+        record('read', t0 - t1)
+
+        self._update()
+        self._settle()
+        t1 = clock()
+        record('convert', t1 - t0)
+
+        if self.idle and self.sample is not None:
+            sample = self.sample
+            demands = sample[:4]
+            switchval = sample[4]
+            t0 = clock()
+            record('demands', t0 - t1)
+
+        else:
+            demands = self._get_pitch(), self._get_roll(), self._get_yaw(), self._get_throttle()
+            switchval = self._get_switchval()
+            t0 = clock()
+            record('demands', t0 - t1)
 
-        # Draw a label for the axis
-        self._draw_label(label, y)
+            if self.filters is not None:
+                demands = self.filters.step(list(demands), self.dt)
+                t1 = clock()
+                record('filter', t1 - t0)
+                t0 = t1
 
-    def _draw_label_in_row(self, text, row, color=(255,255,255)):
+            sample = self.sample = demands[0], demands[1], demands[2], demands[3], switchval
 
-        self._draw_label(text, row*self.row_height, color)
+        if self.renderer is not None:
+            self.renderer.submit(demands, switchval)
+            t1 = clock()
+            record('render', t1 - t0)
+            t0 = t1
 
-    def _draw_label(self, text, y, color=(255,255,255)):
+        for sink in self.sinks:
+            sink.write(self.timestamp, sample, self.axes)
 
-        surface = self.font.render(text, True, color, (0, 0, 0))
-        surface.set_colorkey( (0, 0, 0) )
+        if self.sinks:
+            t1 = clock()
+            record('sinks', t1 - t0)
+            t0 = t1
+
+        record('poll', t0 - start)
+
+        self.profiler.tick()
+
+        return sample
  
-        self.screen.blit(surface, (20, y))
+    def stream(self, rate_hz=None, policy='latest', maxsize=8):
+        '''
+        Returns an asynchronous iterator over samples from poll(), which ends when running() turns
+        False.  Samples are taken at rate_hz, or as fast as possible if that is None.  If the consumer
+        falls behind, policy 'latest' keeps only the newest sample, and policy 'queue' keeps up to
+        maxsize samples and then waits for room.  See quadstick.aio.
+        '''
+        from quadstick import aio
 
-    def _get_axis(self, k):
+        return aio.stream(self, rate_hz, policy, maxsize)
 
-        return self.joystick.get_axis(k)
+    def next_sample(self):
+        '''
+        Returns an awaitable for the next sample from poll(), which is None once running() is False.
+        '''
+        from quadstick import aio
 
-    def _get_button(self, k):
+        return aio.next_sample(self)
 
-        return self.joystick.get_button(k)
+    def profile(self, enabled=True, dump_interval=None, stream=None):
+        '''
+        Turns per-stage timing of poll() on or off.  Stages are pump (event queue), read (device),
+        convert (per-class processing of raw values), demands, filter, render (submitting to the HUD,
+        with draw and flip timed separately wherever the HUD is drawn), sinks, and the whole poll.
+        If dump_interval is given, a table of statistics is written to stream (default stderr)
+        every dump_interval seconds.  When off, timing costs one attribute test per poll.
+        '''
+        from quadstick.stats import Profiler
 
+        self.profiler = Profiler(dump_interval, stream) if enabled else None
 
-class ExtremePro3D(QuadStick):
+        if self.renderer is not None:
+            self.renderer.profiler = self.profiler
 
-    def __init__(self, switch_labels):
+    def stats(self):
         '''
-        Creates a new ExtremePro3D object.
+        Returns a dictionary mapping each poll() stage to a dictionary of count, and of mean, min, max
+        and percentile times in microseconds.  Empty unless profile() has been called.
         '''
-        QuadStick.__init__(self, 'Logitech Extreme 3D Pro', switch_labels)
+        return {} if self.profiler is None else self.profiler.stats()
 
-        self.trigger_is_down = False
+    def set_filters(self, *filters):
+        '''
+        Passes the demands through the given filters, in order, before poll() returns them, replacing
+        any filters set before.  With no filters, demands are returned as they are.  A Deadband with
+        no band of its own uses BAND.  See quadstick.filters.
+        '''
+        from quadstick.filters import Chain
 
-        self.yaw_axis = 3 if self.platform == 'Windows' else 2
+        self.filters = Chain(filters, self.BAND) if filters else None
 
-        # Support alt/pos-hold through repeated button clicks
-        self.buttonstate = 0
+    def sample_at(self, t):
+        '''
+        Returns the demands (pitch, roll, yaw, throttle, switchval) at time t by the controller's
+        clock, interpolated between recent samples or extrapolated past the newest, or None before the
+        first sample.  Needs history; see quadstick.predict, and history.errors() for how well the
+        extrapolation has been doing.
+        '''
+        if self.history is None:
+            raise ValueError('sample_at() needs history')
 
-    def _get_switchval(self):
+        return self.history.sample_at(t)
 
-        if self.joystick.get_button(0):
+    def attach(self, sink):
+        '''
+        Passes every sample from now on to sink.write(timestamp, sample, axes), where sample is the
+        tuple returned by poll() and axes are the raw axis values behind it.  The axes list is updated
+        in place as input arrives, so a sink that keeps it must copy it.
+        '''
+        self.sinks.append(sink)
+
+    def _click_switch(self):
+
+        # Clicks of switch_button step the switch on: the first to 1, the second to 2, the third back
+        # to 0; buttonstate also tracks whether the button is still down
+        if self._get_button(self.switch_button):
             if self.buttonstate == 0:
                 self.buttonstate = 1
             elif self.buttonstate == 2:
@@ -278,7 +819,94 @@ class ExtremePro3D(QuadStick):
             elif self.buttonstate == 5:
                 self.buttonstate = 0
 
-        return [0,1,1,1,2,0][self.buttonstate]
+        return (0, 1, 1, 1, 2, 0)[self.buttonstate]
+
+    def _position_switch(self):
+
+        # Three positions of switch_axis, from low to high
+        switch = self._get_axis(self.switch_axis)
+
+        return 0 if switch < -.5 else (1 if switch < +.5 else 2)
+
+    def _get_axis(self, k):
+
+        return self.axes[k]
+
+    def _get_button(self, k):
+
+        return self.buttons[k]
+
+
+class _SampleSource(QuadStick):
+    '''
+    A QuadStick whose samples arrive whole, as values (pitch, roll, yaw, throttle, switchval),
+    rather than from a joystick's axes and buttons.
+    '''
+
+    # Every sample is new
+    STEADY = False
+
+    def _init_device(self):
+
+        self._init_state()
+
+        self.values = 0., 0., 0., 0., 0
+
+    def _read_device(self):
+
+        return
+
+    def _get_pitch(self):
+
+        return self.values[0]
+
+    def _get_roll(self):
+
+        return self.values[1]
+
+    def _get_yaw(self):
+
+        return self.values[2]
+
+    def _get_throttle(self):
+
+        return self.values[3]
+
+    def _get_switchval(self):
+
+        return self.values[4]
+
+
+class ExtremePro3D(QuadStick):
+
+    # Built-in mappings by platform
+    MAPPINGS = {
+            'Linux':   {'pitch_axis': 1, 'roll_axis': 0, 'yaw_axis': 2, 'throttle_axis': 3, 'switch_button': 0,
+                        'pitch_sign': +1, 'roll_sign': -1, 'yaw_sign': +1, 'throttle_sign': -1},
+            'Windows': {'pitch_axis': 1, 'roll_axis': 0, 'yaw_axis': 3, 'throttle_axis': 3, 'switch_button': 0,
+                        'pitch_sign': +1, 'roll_sign': -1, 'yaw_sign': +1, 'throttle_sign': -1},
+            }
+
+    def __init__(self, switch_labels, **kwargs):
+        '''
+        Creates a new ExtremePro3D object.  Keyword arguments are passed to QuadStick.
+        '''
+        QuadStick.__init__(self, 'Logitech Extreme 3D Pro', switch_labels, **kwargs)
+
+        self.trigger_is_down = False
+
+        self._map(self.MAPPINGS)
+
+        # Support alt/pos-hold through repeated button clicks
+        self.buttonstate = 0
+
+    def _get_switchval(self):
+
+        # A saved mapping may put the switch on an axis instead
+        if self.switch_axis is not None:
+            return self._position_switch()
+
+        return self._click_switch()
 
     def _startup_message(self):
 
@@ -286,61 +914,84 @@ class ExtremePro3D(QuadStick):
 
     def _get_pitch(self):
     
-        return QuadStick._get_axis(self, 1)
+        return self.pitch_sign * QuadStick._get_axis(self, self.pitch_axis)
 
     def _get_roll(self):
     
-        return -QuadStick._get_axis(self, 0)
+        return self.roll_sign * QuadStick._get_axis(self, self.roll_axis)
 
     def _get_yaw(self):
 
-        return QuadStick._get_axis(self, self.yaw_axis)
+        return self.yaw_sign * QuadStick._get_axis(self, self.yaw_axis)
 
     def _get_throttle(self):
 
-        QuadStick._pump(self)   
- 
-        return (-self.joystick.get_axis(3) + 1) / 2
+        return (self.throttle_sign * QuadStick._get_axis(self, self.throttle_axis) + 1) / 2
 
 
 class PS3(QuadStick):
 
-    def __init__(self, switch_labels, throttle_inc=.02):
+    # Throttle integrates the stick
+    STEADY = False
+
+    # The throttle starts at idle, so there's no gesture to wait for
+    GESTURE = False
+
+    # Built-in mappings by platform; the throttle stick moves the throttle, and the switch is buttons
+    MAPPINGS = {
+            'Linux':   {'pitch_axis': 3, 'roll_axis': 2, 'yaw_axis': 0, 'throttle_axis': 1, 'switch_axis': 7,
+                        'pitch_sign': +1, 'roll_sign': -1, 'yaw_sign': +1, 'throttle_sign': -1},
+            'Darwin':  {'pitch_axis': 3, 'roll_axis': 2, 'yaw_axis': 0, 'throttle_axis': 1, 'switch_axis': 9,
+                        'pitch_sign': +1, 'roll_sign': -1, 'yaw_sign': +1, 'throttle_sign': -1},
+            }
+
+    # Polls per second assumed by the old throttle_inc, whose default of .02 per poll is one unit per second
+    THROTTLE_INC_HZ = 50
+
+    def __init__(self, switch_labels, throttle_rate=1., throttle_inc=None, **kwargs):
         '''
-        Creates a new PS3 object.
+        Creates a new PS3 object.  The left stick moves the throttle at up to throttle_rate units
+        per second.  Other keyword arguments are passed to QuadStick.  The old throttle_inc, in
+        units per poll, is deprecated; it is still accepted and taken as a rate at 50 polls per
+        second.
         '''
-        QuadStick.__init__(self, 'PS3', switch_labels)
+        if throttle_inc is not None:
+            import warnings
+            warnings.warn('throttle_inc is deprecated; use throttle_rate, in units per second',
+                    DeprecationWarning, stacklevel=2)
+            throttle_rate = throttle_inc * self.THROTTLE_INC_HZ
 
-        # Special handling for OS X
-        self.switch_axis = 9 if self.platform == 'Darwin' else 7
+        QuadStick.__init__(self, 'PS3', switch_labels, **kwargs)
+
+        self._map(self.MAPPINGS)
 
         self.throttle = 0
 
-        self.throttle_inc = throttle_inc
+        self.throttle_rate = throttle_rate
 
         self.buttonstate = 0
 
-    def _startup(self):
-
-        return
-
     def _get_pitch(self):
     
-        return QuadStick._get_axis(self, 3)
+        return self.pitch_sign * QuadStick._get_axis(self, self.pitch_axis)
 
     def _get_roll(self):
     
-        return -QuadStick._get_axis(self, 2)
+        return self.roll_sign * QuadStick._get_axis(self, self.roll_axis)
 
     def _get_yaw(self):
 
-        return QuadStick._get_axis(self, 0)
+        return self.yaw_sign * QuadStick._get_axis(self, self.yaw_axis)
 
-    def _get_throttle(self):
+    def _update(self):
 
-        self.throttle -= self.throttle_inc * QuadStick._get_axis(self, 1)
+        throttle = self.throttle + self.throttle_sign * self.throttle_rate * self.dt * QuadStick._get_axis(self,
+                self.throttle_axis)
 
-        self.throttle = min(max(self.throttle, 0), 1)
+        # Clamped without min() and max(), which allocate on every call
+        self.throttle = 0 if throttle < 0 else 1 if throttle > 1 else throttle
+
+    def _get_throttle(self):
 
         return self.throttle
 
@@ -0,0 +1,154 @@
+'''
+aio.py - asyncio access to QuadStick controllers
+
+    Copyright (C) 2014 Simon D. Levy
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+Use these through the controller:
+
+    async for pitch, roll, yaw, throttle, switchval in controller.stream(rate_hz=100):
+        ...
+
+    sample = await controller.next_sample()
+
+Each controller gets one worker thread for running() and poll(), so the event loop never blocks on
+the device and the device is only ever touched from one thread.  The exception is a controller
+whose poll() draws its HUD itself (without hud_fps, or on OS X): windows can only be drawn from the
+thread that opened them, and on OS X only from the main thread, so that controller is polled in the
+event loop's thread instead, with the wait for its startup gesture broken into short sleeps.
+'''
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+POLICIES = ('latest', 'queue')
+
+# Seconds between samples while waiting in the event loop's thread for the startup gesture
+STARTUP_WAIT = .01
+
+# Marks the end of a stream
+_END = object()
+
+def _executor(controller):
+
+    if controller.executor is None:
+        controller.executor = ThreadPoolExecutor(1, thread_name_prefix='QuadStick')
+
+    return controller.executor
+
+def _step(controller):
+
+    return controller.poll() if controller.running() else None
+
+def _draws(controller):
+
+    # Whether poll() draws the HUD, rather than leaving it to a render thread
+    return controller.renderer is not None and controller.renderer.thread is None
+
+async def _call(loop, controller):
+
+    if _draws(controller):
+
+        # The startup gesture can take the pilot seconds, so sleep between its samples here rather
+        # than in poll()
+        if not controller.ready:
+            for _ in controller._starting():
+                await asyncio.sleep(STARTUP_WAIT)
+
+        # Nothing to wait on, so give other tasks their turn first
+        await asyncio.sleep(0)
+        return _step(controller)
+
+    return await loop.run_in_executor(_executor(controller), _step, controller)
+
+async def next_sample(controller):
+    '''
+    Returns the next sample from controller.poll(), or None once controller.running() is False.
+    '''
+    return await _call(asyncio.get_running_loop(), controller)
+
+async def stream(controller, rate_hz=None, policy='latest', maxsize=8):
+    '''
+    Yields samples from controller.poll() until controller.running() is False, polling at rate_hz
+    or, if that is None, as fast as the device allows.  When the consumer falls behind, the
+    'latest' policy keeps only the newest sample, while 'queue' holds up to maxsize samples and
+    then stops polling until there is room.
+    '''
+    if policy not in POLICIES:
+        raise ValueError('policy must be one of %s' % ', '.join(POLICIES))
+
+    loop = asyncio.get_running_loop()
+
+    queue = asyncio.Queue(1 if policy == 'latest' else maxsize)
+
+    failure = []
+
+    async def produce():
+
+        period = 1. / rate_hz if rate_hz else 0.
+        deadline = loop.time()
+
+        try:
+
+            while True:
+
+                sample = await _call(loop, controller)
+
+                if sample is None:
+                    break
+
+                if policy == 'latest':
+                    if queue.full():
+                        queue.get_nowait()
+                    queue.put_nowait(sample)
+                else:
+                    await queue.put(sample)
+
+                if period:
+                    deadline += period
+                    delay = deadline - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    else:
+                        # Fell behind; start afresh rather than bursting to catch up
+                        deadline = loop.time()
+
+        except Exception as e:
+            failure.append(e)
+
+        # Waits for the consumer to take any sample still queued
+        await queue.put(_END)
+
+    task = loop.create_task(produce())
+
+    try:
+
+        while True:
+
+            sample = await queue.get()
+
+            if sample is _END:
+                break
+
+            yield sample
+
+        if failure:
+            raise failure[0]
+
+    finally:
+
+        task.cancel()
+
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
@@ -0,0 +1,227 @@
+'''
+filters.py - Filters for QuadStick demands
+
+    Copyright (C) 2014 Simon D. Levy
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+Filters work on the demands (pitch, roll, yaw, throttle) that poll() returns, in the order given:
+
+    controller.set_filters(SlidingMedian(5), LowPass(10), Deadband())
+
+Each filter keeps a fixed amount of state per axis and does a fixed amount of work per sample.
+Time steps come from the controller's clock, so a filter behaves the same at any poll rate.
+
+The same filters can be run over recorded samples and their timestamps, for instance from
+quadstick.record.load(), giving exactly what poll() gave when they were recorded unfiltered:
+
+    timestamps, samples, axes = load('session.qsl')
+    filtered = Chain([SlidingMedian(5), LowPass(10), Deadband()]).run(samples, timestamps)
+'''
+
+import bisect
+import collections
+import copy
+import math
+
+class Filter(object):
+    '''
+    Filters some of the four demands, given by index in axes, leaving the others alone.
+    '''
+
+    def __init__(self, axes=(0, 1, 2, 3)):
+
+        self.axes = tuple(axes)
+
+        self.reset()
+
+    def reset(self):
+        '''
+        Forgets all past samples.
+        '''
+        return
+
+    def step(self, values, dt):
+        '''
+        Filters a list of demands in place, dt seconds after the previous sample.
+        '''
+        for k in self.axes:
+            values[k] = self._step(k, values[k], dt)
+
+
+class Deadband(Filter):
+    '''
+    Zeroes demands within band of neutral, and stretches the rest so they still reach full scale.
+    The band defaults to the controller's BAND.  Applies to pitch, roll and yaw by default.
+    '''
+
+    def __init__(self, band=None, axes=(0, 1, 2)):
+
+        self.band = band
+
+        Filter.__init__(self, axes)
+
+    def _step(self, k, value, dt):
+
+        band = self.band
+
+        if -band <= value <= band:
+            return 0.
+
+        return (value - band if value > 0 else value + band) / (1. - band)
+
+
+class LowPass(Filter):
+    '''
+    First-order low-pass filter with a cutoff frequency in Hz.
+    '''
+
+    def __init__(self, cutoff, axes=(0, 1, 2, 3)):
+
+        self.cutoff = cutoff
+
+        # Time constant in seconds
+        self.tau = 1. / (2 * math.pi * cutoff)
+
+        Filter.__init__(self, axes)
+
+    def reset(self):
+
+        self.outputs = [None] * 4
+
+    def _step(self, k, value, dt):
+
+        output = self.outputs[k]
+
+        if output is None:
+            output = value
+        else:
+            output += dt / (self.tau + dt) * (value - output)
+
+        self.outputs[k] = output
+
+        return output
+
+
+class SlidingMedian(Filter):
+    '''
+    Median of the last window samples, which removes spikes without smearing steps.  The window is
+    kept sorted as samples come and go, so each sample costs a binary search and a short move.
+    '''
+
+    def __init__(self, window=5, axes=(0, 1, 2, 3)):
+
+        self.window = window
+
+        Filter.__init__(self, axes)
+
+    def reset(self):
+
+        self.recent = [collections.deque() for k in range(4)]
+        self.ordered = [[] for k in range(4)]
+
+    def _step(self, k, value, dt):
+
+        recent = self.recent[k]
+        ordered = self.ordered[k]
+
+        if len(recent) == self.window:
+            del ordered[bisect.bisect_left(ordered, recent.popleft())]
+
+        recent.append(value)
+        bisect.insort(ordered, value)
+
+        middle = len(ordered) // 2
+
+        return ordered[middle] if len(ordered) & 1 else (ordered[middle-1] + ordered[middle]) / 2.
+
+
+class SlewLimiter(Filter):
+    '''
+    Limits how fast demands can change, to rate units per second.
+    '''
+
+    def __init__(self, rate, axes=(0, 1, 2, 3)):
+
+        self.rate = rate
+
+        Filter.__init__(self, axes)
+
+    def reset(self):
+
+        self.outputs = [None] * 4
+
+    def _step(self, k, value, dt):
+
+        output = self.outputs[k]
+
+        if output is not None:
+            limit = self.rate * dt
+            value = min(max(value, output - limit), output + limit)
+
+        self.outputs[k] = value
+
+        return value
+
+
+class Chain(object):
+    '''
+    Runs filters one after another.  A Deadband with no band of its own gets band.
+    '''
+
+    def __init__(self, filters, band=0.2):
+
+        self.filters = list(filters)
+
+        for f in self.filters:
+            if isinstance(f, Deadband) and f.band is None:
+                f.band = band
+
+    def reset(self):
+        '''
+        Forgets all past samples.
+        '''
+        for f in self.filters:
+            f.reset()
+
+    def step(self, values, dt):
+        '''
+        Filters a list of demands in place, dt seconds after the previous sample, and returns it.
+        '''
+        for f in self.filters:
+            f.step(values, dt)
+
+        return values
+
+    def run(self, samples, timestamps):
+        '''
+        Filters a sequence of recorded samples, starting afresh, and returns the filtered samples as
+        tuples.  Only the first four values of each sample are filtered, and anything after them,
+        such as the switch value, is passed through.  This chain's own state is left alone.
+        '''
+        chain = copy.deepcopy(self)
+        chain.reset()
+
+        filtered = []
+
+        previous = None
+
+        for sample, timestamp in zip(samples, timestamps):
+
+            # Time steps as the controller works them out
+            dt = 0. if previous is None else max(timestamp - previous, 0.)
+            previous = timestamp
+
+            values = list(sample)
+            chain.step(values, dt)
+            filtered.append(tuple(values))
+
+        return filtered
@@ -0,0 +1,458 @@
+'''
+hud.py - Heads-up display of QuadStick demands
+
+    Copyright (C) 2014 Simon D. Levy
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+'''
+
+import pygame
+import pygame.locals
+import threading
+import time
+
+BLACK = (0,0,0)
+WHITE = (255,255,255)
+
+# Fonts by (name, size), since looking one up scans the system's fonts
+_fonts = {}
+
+def _font(name, size):
+
+    font = _fonts.get((name, size))
+
+    if font is None:
+        pygame.font.init()
+        font = _fonts[name, size] = pygame.font.Font(pygame.font.match_font(name), size)
+
+    return font
+
+class HUD(object):
+    '''
+    Displays the four demand bars and three switches.  Frames and labels are drawn once into a
+    background surface, and each frame redraws only the bars and switches whose pixels changed.
+    '''
+
+    # Axis labels and the sign used to display each demand
+    AXES = (('Pitch', -1), ('Roll', -1), ('Yaw', +1), ('Throttle', +1))
+
+    def __init__(self, name, switch_labels, size=(500,280), screen=None):
+        '''
+        Creates a new HUD object, opening a window of the given size, or drawing on part of a window
+        if screen is a subsurface of it; name is then shown at the foot of the HUD.
+        '''
+        if screen is None:
+            self.screen = pygame.display.set_mode(size, pygame.locals.RESIZABLE)
+            pygame.display.set_caption('QuadStick: ' + name)
+            self.title = None
+        else:
+            self.screen = screen
+            size = screen.get_size()
+            self.title = name
+
+        self.size = size
+
+        # Where this HUD sits in the window
+        self.offset = self.screen.get_abs_offset()
+
+        self.font = _font('Courier', 20)
+
+        self.switch_labels = switch_labels
+
+        self.row_height = 30
+
+        # Rendered text, keyed by (text, color)
+        self.glyphs = {}
+
+        self.background = None
+
+        self._invalidate()
+
+    def resize(self, size):
+        '''
+        Reopens the window at a new size after a resize event.
+        '''
+        self.screen = pygame.display.set_mode(size, pygame.locals.RESIZABLE)
+
+        self._invalidate()
+
+    def clear(self):
+        '''
+        Clears the display.  The next call to show() repaints everything.
+        '''
+        self.screen.fill(BLACK)
+
+        self._invalidate()
+
+    def show(self, demands, switchval):
+        '''
+        Displays demands (pitch, roll, yaw, throttle) and switch value, updating only what changed.
+        '''
+        rects = self.draw(demands, switchval)
+
+        if rects:
+            pygame.display.update(rects)
+
+    def draw(self, demands, switchval):
+        '''
+        Draws demands and switch value onto the screen surface without updating the display.
+        Returns the list of rectangles that changed.
+        '''
+        rects = []
+
+        if self.full:
+            self.screen.blit(self._get_background(), (0,0))
+            rects.append(self.screen.get_rect())
+            self.full = False
+
+        for index in range(4):
+            bar = self._bar(index, demands[index])
+            if bar != self.bars[index]:
+                rects.append(self._draw_bar(index, bar))
+                self.bars[index] = bar
+
+        for index in range(3):
+            on = switchval == index
+            if on != self.switches[index]:
+                rects.append(self._draw_switch(index, on))
+                self.switches[index] = on
+
+        if rects and self.offset != (0,0):
+            rects = [rect.move(self.offset) for rect in rects]
+
+        return rects
+
+    def message(self, msg):
+        '''
+        Displays a message, one line per row starting at the second row.
+        '''
+        self.clear()
+
+        self._display(msg)
+
+    def error(self, msg):
+        '''
+        Displays an error message under a red ERROR heading.
+        '''
+        self.clear()
+
+        self._draw_label_in_row('ERROR', 0, color=(255,0,0))
+
+        self._display(msg)
+
+    def _invalidate(self):
+
+        self.full = True
+
+        # What was last drawn for each bar and switch
+        self.bars = [None] * 4
+        self.switches = [None] * 3
+
+    def _display(self, msg):
+
+        row = 1
+        for line in msg.split('\n'):
+            self._draw_label_in_row(line, row, cache=False)
+            row += 1
+
+        pygame.display.flip()
+
+    def _get_background(self):
+
+        if self.background is None:
+
+            self.background = pygame.Surface(self.size)
+            self.background.fill(BLACK)
+
+            for index in range(4):
+
+                x, y, w, h = self._bar_frame(index)
+
+                # Draw a white hollow rectangle to represent the limits
+                pygame.draw.rect(self.background, WHITE, (x, y, w, h), 1)
+
+                # Draw a label for the axis
+                self._draw_label(self.AXES[index][0], y, surface=self.background)
+
+            for index in range(3):
+
+                x, y, r = self._switch_position(index)
+
+                # Draw a white ring around the button
+                pygame.draw.circle(self.background, WHITE, (x, y), r, 1)
+
+                self._draw_label(self.switch_labels[index], y-10, surface=self.background)
+
+            if self.title is not None:
+                self._draw_label(self.title, 250, surface=self.background)
+
+        return self.background
+
+    @staticmethod
+    def _bar_frame(index):
+
+        return 149, 20 + index * 30, 200, 20
+
+    @staticmethod
+    def _switch_position(index):
+
+        return 200, 180 + index * 30, 10
+
+    def _bar(self, index, value):
+
+        # color for no-demand baseline
+        color = (0, 0, 255)
+
+        demand = self.AXES[index][1] * value
+
+        if demand > 0:
+            color =  (0, 255, 0)
+
+        if demand < 0:
+            color =  (255, 0, 0)
+
+        w = 100         # width of rectangle for maximum demand
+        x = 250
+
+        # Special handling for throttle
+        if index == 3:
+            x -= w
+            w += w
+
+        # Bars are compared in whole pixels, so tiny changes in demand cost nothing
+        width = int(demand * w)
+
+        return color, (x + min(width, 0), abs(width))
+
+    def _draw_bar(self, index, bar):
+
+        x, y, w, h = self._bar_frame(index)
+
+        # Restore the frame, allowing for bars that overhang it
+        area = pygame.Rect(x, y, w + 2, h)
+        self.screen.blit(self._get_background(), area, area)
+
+        # Draw a colorful filled rectangle to represent the demand
+        color, (left, width) = bar
+        if width > 0:
+            pygame.draw.rect(self.screen, color, (left, y, width, h))
+
+        return area
+
+    def _draw_switch(self, index, on):
+
+        x, y, r = self._switch_position(index)
+
+        # Draw a white or black disk inside the ring depending on switch state
+        return pygame.draw.circle(self.screen, WHITE if on else BLACK, (x, y), r-3)
+
+    def _draw_label_in_row(self, text, row, color=WHITE, cache=True):
+
+        self._draw_label(text, row*self.row_height, color, cache=cache)
+
+    def _draw_label(self, text, y, color=WHITE, surface=None, cache=True):
+
+        glyph = self.glyphs.get((text, color)) if cache else None
+
+        if glyph is None:
+            glyph = self.font.render(text, True, color, BLACK)
+            glyph.set_colorkey(BLACK)
+            if cache:
+                self.glyphs[text, color] = glyph
+
+        (self.screen if surface is None else surface).blit(glyph, (20, y))
+
+
+class MultiHUD(HUD):
+    '''
+    Displays several HUDs side by side in one window, each with its name at its foot.  Messages
+    and errors use the whole window.
+    '''
+
+    def __init__(self, name, panels, panel_size=(500,280)):
+        '''
+        Creates a new MultiHUD object for panels, a list of (name, switch_labels) pairs.
+        '''
+        self.panel_specs = panels
+        self.panel_size = panel_size
+
+        HUD.__init__(self, name, panels[0][1], (panel_size[0] * len(panels), panel_size[1]))
+
+        self._layout()
+
+    def resize(self, size):
+        '''
+        Reopens the window at a new size after a resize event.  Panels that no longer fit are not shown.
+        '''
+        HUD.resize(self, size)
+
+        self._layout()
+
+    def clear(self):
+        '''
+        Clears the display.  The next call to show() repaints everything.
+        '''
+        HUD.clear(self)
+
+        for panel in self.panels:
+            panel._invalidate()
+
+    def draw(self, demands, switchval):
+        '''
+        Draws a list of demands and a list of switch values, one for each panel, onto the screen
+        surface without updating the display.  Returns the list of rectangles that changed.
+        '''
+        rects = []
+
+        for panel, panel_demands, panel_switchval in zip(self.panels, demands, switchval):
+            rects.extend(panel.draw(panel_demands, panel_switchval))
+
+        return rects
+
+    def _layout(self):
+
+        bounds = self.screen.get_rect()
+
+        self.panels = []
+
+        for index, (name, switch_labels) in enumerate(self.panel_specs):
+
+            area = pygame.Rect((index * self.panel_size[0], 0), self.panel_size).clip(bounds)
+
+            if area.width and area.height:
+                panel = HUD(name, switch_labels, screen=self.screen.subsurface(area))
+                panel.glyphs = self.glyphs
+                self.panels.append(panel)
+
+
+class Renderer(object):
+    '''
+    Shows the latest submitted sample on a HUD, so that polling need not wait on the display.
+    With neither fps nor every given, every sample is shown as it is submitted.  With every=N,
+    every Nth sample is shown.  With fps, frames are shown at that rate, on a thread of their own
+    if threaded is True and in the submitting thread otherwise.  Samples that arrive between
+    frames are coalesced: only the latest is shown.
+    '''
+
+    def __init__(self, hud, fps=None, every=None, threaded=True):
+        '''
+        Creates a new Renderer object for the given HUD.
+        '''
+        self.hud = hud
+
+        self.period = 1. / fps if fps else None
+        self.every = every or (None if fps else 1)
+
+        # Held while drawing; hold it to draw anything else on the HUD
+        self.lock = threading.RLock()
+
+        self.sample_lock = threading.Lock()
+        self.latest = None
+        self.pending = 0
+
+        # Number of frames shown, samples submitted, and samples behind the most recent frame
+        self.frames = 0
+        self.samples = 0
+        self.coalesced = 0
+
+        self.next_frame = time.monotonic()
+
+        # Times drawing and flipping when set; see QuadStick.profile()
+        self.profiler = None
+
+        self.closed = threading.Event()
+
+        self.thread = None
+
+        if self.period and threaded:
+            self.thread = threading.Thread(target=self._run, name='QuadStick HUD')
+            self.thread.daemon = True
+            self.thread.start()
+
+    def submit(self, demands, switchval):
+        '''
+        Submits a sample for display.
+        '''
+        with self.sample_lock:
+            self.latest = demands, switchval
+            self.pending += 1
+            self.samples += 1
+            pending = self.pending
+
+        if self.thread is not None:
+            return
+
+        if self.every:
+            if pending >= self.every:
+                self._render()
+
+        elif time.monotonic() >= self.next_frame:
+            self._advance()
+            self._render()
+
+    def coalesced_per_frame(self):
+        '''
+        Returns the average number of samples behind each frame shown so far.
+        '''
+        return float(self.samples - self.pending) / self.frames if self.frames else 0.
+
+    def close(self):
+        '''
+        Stops the render thread, if any.
+        '''
+        self.closed.set()
+
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+
+    def _run(self):
+
+        while not self.closed.wait(max(self.next_frame - time.monotonic(), 0)):
+            self._advance()
+            self._render()
+
+    def _advance(self):
+
+        # Keep to the frame schedule, but don't try to catch up on frames we missed
+        self.next_frame += self.period
+        now = time.monotonic()
+        if self.next_frame < now:
+            self.next_frame = now + self.period
+
+    def _render(self):
+
+        with self.sample_lock:
+            if not self.pending:
+                return
+            demands, switchval = self.latest
+            self.coalesced = self.pending
+            self.pending = 0
+
+        with self.lock:
+            if self.profiler is None:
+                self.hud.show(demands, switchval)
+            else:
+                self._show_profiled(demands, switchval)
+            self.frames += 1
+
+    def _show_profiled(self, demands, switchval):
+
+        profiler = self.profiler
+
+        t0 = time.perf_counter_ns()
+        rects = self.hud.draw(demands, switchval)
+        t1 = time.perf_counter_ns()
+        profiler.record('draw', t1 - t0)
+
+        if rects:
+            pygame.display.update(rects)
+            profiler.record('flip', time.perf_counter_ns() - t1)
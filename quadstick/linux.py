@@ -0,0 +1,337 @@
+'''
+linux.py - Native Linux joystick input, bypassing pygame
+
+    Copyright (C) 2014 Simon D. Levy
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+Pass one of these objects to a QuadStick as device=, or just pass the path of the device node:
+
+    controller = Taranis(('0', '1', '2'), device='/dev/input/js0')
+
+Reads never block.  Any file that delivers the right records will do, so a FIFO fed with canned
+event bytes stands in for a real device; since a FIFO has no ioctls, give the number of axes and
+buttons (joydev) or the axis and button codes (evdev) explicitly.
+'''
+
+import errno
+import fcntl
+import os
+import struct
+import time
+
+# struct js_event from linux/joystick.h
+JS_EVENT = struct.Struct('IhBB')
+
+JS_EVENT_BUTTON = 0x01
+JS_EVENT_AXIS   = 0x02
+JS_EVENT_INIT   = 0x80
+
+JSIOCGAXES    = 0x80016a11
+JSIOCGBUTTONS = 0x80016a12
+
+# Longest device name we ask for
+NAME_LENGTH = 128
+
+JSIOCGNAME = (2 << 30) | (NAME_LENGTH << 16) | (ord('j') << 8) | 0x13
+
+# struct input_event and struct input_absinfo from linux/input.h
+INPUT_EVENT = struct.Struct('llHHi')
+INPUT_ABSINFO = struct.Struct('6i')
+
+EV_KEY = 0x01
+EV_ABS = 0x03
+
+ABS_CNT = 0x40
+KEY_CNT = 0x300
+
+BTN_MISC = 0x100
+
+def _ioc(direction, nr, size):
+
+    return (direction << 30) | (size << 16) | (ord('E') << 8) | nr
+
+def _eviocgbit(ev, length):
+
+    return _ioc(2, 0x20 + ev, length)
+
+def _eviocgabs(code):
+
+    return _ioc(2, 0x40 + code, INPUT_ABSINFO.size)
+
+EVIOCSCLOCKID = _ioc(1, 0xa0, 4)
+
+EVIOCGNAME = _ioc(2, 0x06, NAME_LENGTH)
+
+EVIOCGKEY = _ioc(2, 0x18, (KEY_CNT + 7) // 8)
+
+CLOCK_MONOTONIC = 1
+
+def open_device(path):
+    '''
+    Opens a joydev (/dev/input/js*) or evdev (/dev/input/event*) node, depending on its name.
+    '''
+    return (Joydev if os.path.basename(path).startswith('js') else Evdev)(path)
+
+
+class _EventDevice(object):
+
+    # Events to read at once
+    BATCH = 64
+
+    def __init__(self, path, record):
+
+        self.path = path
+
+        self.record = record
+
+        self.fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+
+        # Bytes of a record split across reads
+        self.partial = b''
+
+        # Seconds from the kernel stamping the latest event to our reading it, where known
+        self.latency = None
+
+    def init(self):
+
+        return
+
+    def fileno(self):
+
+        return self.fd
+
+    def close(self):
+
+        os.close(self.fd)
+
+    def get_name(self):
+
+        # The name the driver reports, or the node's own for files with no ioctls
+        try:
+            name = fcntl.ioctl(self.fd, self.NAME_REQUEST, bytes(NAME_LENGTH))
+        except (IOError, OSError):
+            return os.path.basename(self.path)
+
+        return name.split(b'\0', 1)[0].decode('utf-8', 'replace')
+
+    def get_numaxes(self):
+
+        return len(self.axes)
+
+    def get_numbuttons(self):
+
+        return len(self.buttons)
+
+    def get_axis(self, k):
+
+        return self.axes[k]
+
+    def get_button(self, k):
+
+        return self.buttons[k]
+
+    def snapshot(self):
+        '''
+        Applies all pending events and returns copies of the axis and button states.
+        '''
+        self.update()
+
+        return list(self.axes), list(self.buttons)
+
+    def update(self):
+        '''
+        Applies all pending events to the axis and button states, without blocking.
+        '''
+        size = self.record.size * self.BATCH
+
+        while True:
+
+            try:
+                data = os.read(self.fd, size)
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+                raise
+
+            # A FIFO with no writer reads as empty
+            if not data:
+                break
+
+            if self.partial:
+                data = self.partial + data
+
+            end = len(data) - len(data) % self.record.size
+
+            self.partial = data[end:]
+
+            self._apply(self.record.iter_unpack(data[:end]))
+
+            if len(data) < size:
+                break
+
+    @staticmethod
+    def _scale(value):
+
+        # Same scaling as pygame
+        return value / 32767. if value > 0 else value / 32768.
+
+
+class Joydev(_EventDevice):
+    '''
+    Reads a joydev node such as /dev/input/js0.
+    '''
+
+    NAME_REQUEST = JSIOCGNAME
+
+    def __init__(self, path='/dev/input/js0', numaxes=None, numbuttons=None):
+        '''
+        Creates a new Joydev object.  The numbers of axes and buttons are asked of the device
+        unless given.
+        '''
+        _EventDevice.__init__(self, path, JS_EVENT)
+
+        if numaxes is None:
+            numaxes = self._ioctl_byte(JSIOCGAXES)
+
+        if numbuttons is None:
+            numbuttons = self._ioctl_byte(JSIOCGBUTTONS)
+
+        self.axes = [0.] * numaxes
+        self.buttons = [0] * numbuttons
+
+    def _ioctl_byte(self, request):
+
+        return struct.unpack('B', fcntl.ioctl(self.fd, request, b'\0'))[0]
+
+    def _apply(self, events):
+
+        axes = self.axes
+        buttons = self.buttons
+
+        # Initial-state events are flagged, but are otherwise ordinary events
+        for _, value, kind, number in events:
+
+            kind &= ~JS_EVENT_INIT
+
+            if kind == JS_EVENT_AXIS:
+                if number < len(axes):
+                    axes[number] = self._scale(value)
+
+            elif kind == JS_EVENT_BUTTON:
+                if number < len(buttons):
+                    buttons[number] = value
+
+
+class Evdev(_EventDevice):
+    '''
+    Reads an evdev node such as /dev/input/event5.  Axes and buttons are numbered in order of
+    their event codes, as joydev and SDL number them.
+    '''
+
+    NAME_REQUEST = EVIOCGNAME
+
+    def __init__(self, path, axis_codes=None, button_codes=None, absinfo=None):
+        '''
+        Creates a new Evdev object.  The axis and button codes and each axis's range are asked of
+        the device unless given; absinfo maps axis codes to (minimum, maximum).  Axes and buttons
+        start from the device's state when it is opened, or from zero if absinfo is given or the
+        device has no ioctls.
+        '''
+        _EventDevice.__init__(self, path, INPUT_EVENT)
+
+        if axis_codes is None:
+            axis_codes = self._codes(EV_ABS, ABS_CNT)
+
+        if button_codes is None:
+            button_codes = [code for code in self._codes(EV_KEY, KEY_CNT) if code >= BTN_MISC]
+
+        # Axis values when opened, by code
+        values = {}
+
+        if absinfo is None:
+            absinfo = {}
+            for code in axis_codes:
+                values[code], lo, hi = self._absinfo(code)
+                absinfo[code] = lo, hi
+
+        # Code -> (index, offset, scale) for axes, code -> index for buttons
+        self.axis_map = {}
+        for index, code in enumerate(axis_codes):
+            lo, hi = absinfo.get(code, (-32768, 32767))
+            self.axis_map[code] = index, (hi + lo) / 2., 2. / ((hi - lo) or 1)
+
+        self.button_map = dict((code, index) for index, code in enumerate(button_codes))
+
+        self.axes = [0.] * len(axis_codes)
+
+        # Events only report changes, so an axis or button that hasn't moved would otherwise read zero
+        for code, value in values.items():
+            index, offset, scale = self.axis_map[code]
+            self.axes[index] = max(-1., min(1., (value - offset) * scale))
+
+        self.buttons = self._keys(button_codes)
+
+        # Ask for monotonic timestamps, so we can measure how long events take to reach us
+        try:
+            fcntl.ioctl(self.fd, EVIOCSCLOCKID, struct.pack('i', CLOCK_MONOTONIC))
+            self.clock = time.monotonic
+        except (IOError, OSError):
+            self.clock = None
+
+    def _codes(self, ev, count):
+
+        bits = bytearray(fcntl.ioctl(self.fd, _eviocgbit(ev, (count + 7) // 8), bytes((count + 7) // 8)))
+
+        return [code for code in range(count) if bits[code // 8] & (1 << (code % 8))]
+
+    def _absinfo(self, code):
+
+        # Where the axis is now and its range; centred in the default range, for files with no ioctls
+        try:
+            info = fcntl.ioctl(self.fd, _eviocgabs(code), bytes(INPUT_ABSINFO.size))
+        except (IOError, OSError):
+            return 0, -32768, 32767
+
+        value, lo, hi, _, _, _ = INPUT_ABSINFO.unpack(info)
+
+        return value, lo, hi
+
+    def _keys(self, codes):
+
+        # Which of the buttons are down now; none, for files with no ioctls
+        try:
+            bits = bytearray(fcntl.ioctl(self.fd, EVIOCGKEY, bytes((KEY_CNT + 7) // 8)))
+        except (IOError, OSError):
+            return [0] * len(codes)
+
+        return [1 if bits[code // 8] & (1 << (code % 8)) else 0 for code in codes]
+
+    def _apply(self, events):
+
+        axis_map = self.axis_map
+        button_map = self.button_map
+
+        sec = usec = 0
+
+        for sec, usec, kind, code, value in events:
+
+            if kind == EV_ABS:
+                if code in axis_map:
+                    index, offset, scale = axis_map[code]
+                    self.axes[index] = max(-1., min(1., (value - offset) * scale))
+
+            elif kind == EV_KEY:
+                if code in button_map:
+                    self.buttons[button_map[code]] = 1 if value else 0
+
+        if sec and self.clock is not None:
+            self.latency = self.clock() - (sec + usec / 1e6)
@@ -0,0 +1,109 @@
+'''
+mapping.py - Saved axis and button mappings for QuadStick devices
+
+    Copyright (C) 2014 Simon D. Levy
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+Mappings are made with jsmap.py and kept in one JSON file, ~/.quadstick/mappings.json unless the
+QUADSTICK_MAPPINGS environment variable names another.  Each is keyed by the device's GUID and name,
+and gives controller attributes such as pitch_axis, pitch_sign or switch_axis:
+
+    {
+        "030000001008000001e5000010010000:Wailly PPM": {"pitch_axis": 2, "pitch_sign": -1, ...}
+    }
+
+A controller looks its device up when it starts, and a saved mapping overrides its built-in one.  A
+saved switch_axis or switch_button replaces the built-in switch, on an axis or a button alike.
+The file is read once per process.
+'''
+
+import json
+import os
+
+# Attributes a mapping may set
+ATTRIBUTES = (
+        'pitch_axis', 'roll_axis', 'yaw_axis', 'throttle_axis', 'switch_axis', 'switch_button',
+        'pitch_sign', 'roll_sign', 'yaw_sign', 'throttle_sign',
+        )
+
+# Mappings by path, once read
+_files = {}
+
+def default_path():
+    '''
+    Returns the path of the mappings file.
+    '''
+    return os.environ.get('QUADSTICK_MAPPINGS') or os.path.join(os.path.expanduser('~'), '.quadstick',
+            'mappings.json')
+
+def key(joystick):
+    '''
+    Returns the key for a joystick-like object: its GUID, if it has one, and its name.
+    '''
+    guid = joystick.get_guid() if hasattr(joystick, 'get_guid') else ''
+    name = joystick.get_name() if hasattr(joystick, 'get_name') else ''
+
+    return '%s:%s' % (guid, name)
+
+def load(path=None):
+    '''
+    Returns a dictionary of all mappings in the file at path, which is read only the first time.
+    '''
+    path = path or default_path()
+
+    mappings = _files.get(path)
+
+    if mappings is None:
+
+        try:
+            with open(path) as f:
+                mappings = json.load(f)
+        except (IOError, OSError):
+            mappings = {}
+
+        _files[path] = mappings
+
+    return mappings
+
+def lookup(joystick, path=None):
+    '''
+    Returns the saved mapping for a joystick-like object, or None if there is none.
+    '''
+    return load(path).get(key(joystick))
+
+def save(joystick_key, mapping, path=None):
+    '''
+    Saves a mapping under joystick_key, replacing any saved before.
+    '''
+    unknown = set(mapping) - set(ATTRIBUTES)
+
+    if unknown:
+        raise ValueError('Unknown mapping attributes: %s' % ', '.join(sorted(unknown)))
+
+    path = path or default_path()
+
+    # Start from what's on disk now, in case another process saved in the meantime
+    _files.pop(path, None)
+    mappings = load(path)
+
+    mappings[joystick_key] = dict(mapping)
+
+    directory = os.path.dirname(path)
+
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    # Replace the file all at once, so a controller starting meanwhile never reads half of it
+    with open(path + '.tmp', 'w') as f:
+        json.dump(mappings, f, indent=4, sort_keys=True)
+
+    os.replace(path + '.tmp', path)
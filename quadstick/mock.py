@@ -0,0 +1,104 @@
+'''
+mock.py - A scriptable stand-in for a pygame joystick
+
+    Copyright (C) 2014 Simon D. Levy
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+Drive any controller without hardware:
+
+    joystick = MockJoystick()
+    controller = Taranis(('0', '1', '2'), device=joystick)
+
+    while controller.running():
+        joystick.advance()
+        controller.poll()
+'''
+
+import math
+
+def sweep(step, numaxes, numbuttons):
+    '''
+    The default script: each axis follows a sine wave of its own frequency, and each button
+    toggles at its own rate.
+    '''
+    axes = [math.sin(step * .01 * (k + 1)) for k in range(numaxes)]
+    buttons = [(step // (50 * (k + 1))) & 1 for k in range(numbuttons)]
+
+    return axes, buttons
+
+
+class MockJoystick(object):
+    '''
+    Looks like a pygame Joystick.  Its axes and buttons come from script(step, numaxes, numbuttons),
+    which returns lists of axis and button values for each step; advance() moves to the next step.
+    '''
+
+    def __init__(self, numaxes=6, numbuttons=12, script=sweep, name='Mock Joystick'):
+        '''
+        Creates a new MockJoystick object.
+        '''
+        self.numaxes = numaxes
+        self.numbuttons = numbuttons
+
+        self.script = script
+
+        self.name = name
+
+        self.step = -1
+
+        self.advance()
+
+    def advance(self):
+        '''
+        Moves to the next step of the script.
+        '''
+        self.step += 1
+
+        self.axes, self.buttons = self.script(self.step, self.numaxes, self.numbuttons)
+
+    def set(self, axes=None, buttons=None):
+        '''
+        Overrides the current axis or button values.
+        '''
+        if axes is not None:
+            self.axes = list(axes)
+
+        if buttons is not None:
+            self.buttons = list(buttons)
+
+    def init(self):
+
+        return
+
+    def get_name(self):
+
+        return self.name
+
+    def get_numaxes(self):
+
+        return self.numaxes
+
+    def get_numbuttons(self):
+
+        return self.numbuttons
+
+    def get_numhats(self):
+
+        return 0
+
+    def get_axis(self, k):
+
+        return self.axes[k]
+
+    def get_button(self, k):
+
+        return self.buttons[k]
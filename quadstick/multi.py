@@ -0,0 +1,247 @@
+'''
+multi.py - Polling several QuadStick controllers together
+
+    Copyright (C) 2014 Simon D. Levy
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+For an instructor on the first joystick who can take over from a student on a Taranis:
+
+    instructor = ExtremePro3D(('Manual', 'Alt-hold', 'Pos-hold'), device=0, hud=False)
+    student = Taranis(('Manual', 'Alt-hold', 'Pos-hold'), device=1, hud=False)
+
+    manager = Manager([instructor, student], Priority())
+
+    while manager.running():
+        pitch, roll, yaw, throttle, switchval = manager.poll()
+
+Controllers are given in order of priority, and must be created with hud=False (or headless=True)
+so that the manager's window is the only one.
+'''
+
+import time
+
+import quadstick
+
+class Priority(object):
+    '''
+    Gives the output to the controller with the highest priority whose pitch, roll or yaw is outside
+    band, the moment it moves.  Once no longer active, a controller keeps the output for hold seconds
+    before handing it back to the next active controller, or to the one with the lowest priority when
+    none is active.
+    '''
+
+    def __init__(self, band=0.2, hold=0.5):
+        '''
+        Creates a new Priority object.
+        '''
+        self.band = band
+        self.hold = hold
+
+        # Index of the controller with the output, and when it was last active
+        self.owner = None
+        self.active_at = None
+
+    def arbitrate(self, samples, timestamp):
+        '''
+        Returns the sample of the controller that has the output.
+        '''
+        active = None
+
+        for index, sample in enumerate(samples):
+            if abs(sample[0]) > self.band or abs(sample[1]) > self.band or abs(sample[2]) > self.band:
+                active = index
+                break
+
+        if self.owner is None:
+            self.owner = len(samples) - 1
+            self.active_at = timestamp
+
+        if active is not None and active <= self.owner:
+            self.owner = active
+            self.active_at = timestamp
+
+        elif timestamp - self.active_at >= self.hold:
+            self.owner = len(samples) - 1 if active is None else active
+            self.active_at = timestamp
+
+        return samples[self.owner]
+
+
+class Average(object):
+    '''
+    Averages the demands of all controllers, weighted by weights if given.  The switch value comes
+    from the controller with the highest priority.
+    '''
+
+    def __init__(self, weights=None):
+        '''
+        Creates a new Average object.
+        '''
+        self.weights = weights
+
+    def arbitrate(self, samples, timestamp):
+        '''
+        Returns the weighted average of samples.
+        '''
+        weights = self.weights or [1.] * len(samples)
+
+        total = float(sum(weights))
+
+        demands = [sum(weight * sample[axis] for weight, sample in zip(weights, samples)) / total for axis in range(4)]
+
+        return demands[0], demands[1], demands[2], demands[3], samples[0][4]
+
+
+class Ownership(object):
+    '''
+    Takes each of pitch, roll, yaw, throttle and switch value from the controller that owns it.
+    '''
+
+    def __init__(self, owners):
+        '''
+        Creates a new Ownership object, where owners gives the index of the controller that owns each
+        of pitch, roll, yaw, throttle and switch value.  For example, (1, 1, 0, 0, 0) lets the second
+        controller fly pitch and roll while the first keeps yaw, throttle and the switch.
+        '''
+        self.owners = tuple(owners)
+
+    def arbitrate(self, samples, timestamp):
+        '''
+        Returns each value from its owner's sample.
+        '''
+        owners = self.owners
+
+        return (samples[owners[0]][0], samples[owners[1]][1], samples[owners[2]][2], samples[owners[3]][3],
+                samples[owners[4]][4])
+
+
+class Manager(quadstick._Poller):
+    '''
+    Polls several controllers of any kind with a single pass over the event queue, arbitrates
+    between their samples with a policy, and shows them all, with the result, in one window.
+    '''
+
+    def __init__(self, controllers, policy=None, headless=False, hud_fps=None, hud_every=None,
+            render_thread=True, clock=None, name='QuadStick'):
+        '''
+        Creates a new Manager object for controllers, in order of priority.  The policy has an
+        arbitrate(samples, timestamp) method that makes one sample out of a list with one sample
+        per controller, and defaults to Priority().  The remaining arguments are as for QuadStick.
+        '''
+        self.controllers = list(controllers)
+
+        self.policy = policy or Priority()
+
+        self.headless = headless
+
+        self.hud = None
+        self.renderer = None
+
+        if not headless:
+            from quadstick.hud import MultiHUD, Renderer
+            panels = [(controller.name, controller.switch_labels) for controller in self.controllers]
+            panels.append(('Output', self.controllers[0].switch_labels))
+            self.hud = MultiHUD(name, panels)
+            # OS X only allows drawing from the main thread
+            self.renderer = Renderer(self.hud, hud_fps, hud_every, render_thread and quadstick._platform() != 'Darwin')
+
+        self._init_events()
+
+        self.clock = clock or time.monotonic
+        self.timestamp = None
+
+        # Latest sample from each controller
+        self.samples = [None] * len(self.controllers)
+
+        self.sinks = []
+
+        self.ready = False
+
+        # Longest sleep, in seconds, while waiting for input on startup or error
+        self.WAIT = 0.1
+
+    def poll(self):
+        '''
+        Samples every controller and returns the sample chosen by the policy, as a tuple
+        (pitch, roll, yaw, throttle, switchval).  Each controller's own sinks get its own sample.
+        '''
+        self._startup()
+
+        self._snapshot()
+
+        samples = self.samples
+
+        for index, controller in enumerate(self.controllers):
+
+            sample = samples[index] = controller._demands()
+
+            for sink in controller.sinks:
+                sink.write(controller.timestamp, sample, controller.axes)
+
+        sample = self.policy.arbitrate(samples, self.timestamp)
+
+        if self.renderer is not None:
+            shown = samples + [sample]
+            self.renderer.submit([s[:4] for s in shown], [s[4] for s in shown])
+
+        if self.sinks:
+            axes = [value for controller in self.controllers for value in controller.axes]
+            for sink in self.sinks:
+                sink.write(self.timestamp, sample, axes)
+
+        return sample
+
+    def attach(self, sink):
+        '''
+        Passes every arbitrated sample from now on to sink.write(timestamp, sample, axes), where axes
+        are the raw axis values of all controllers in turn.
+        '''
+        self.sinks.append(sink)
+
+    def _input(self, events):
+
+        # One pass over the event queue serves every controller
+        for controller in self.controllers:
+            controller._input(events)
+
+    def _filenos(self):
+
+        filenos = [getattr(controller.joystick, 'fileno', None) for controller in self.controllers]
+
+        return None if None in filenos else [fileno() for fileno in filenos]
+
+    def _snapshot(self):
+
+        self._pump()
+
+        self.timestamp = self.clock()
+
+        for controller in self.controllers:
+            controller._sample()
+
+    def _starting(self):
+
+        # Each controller that needs one makes its startup gesture in turn, yielding whenever it
+        # needs another sample
+        for controller in self.controllers:
+            if not controller.ready:
+                if controller.GESTURE:
+                    self.message(controller.name + ':\n' + controller._startup_message())
+                    yield from controller._await_startup(self._snapshot, self._interrupted)
+                    if self._interrupted():
+                        break
+                controller.ready = True
+
+        self.clear()
+
+        # Given up, the run is over, and running() will say so
+        self.ready = not self._interrupted()
@@ -0,0 +1,291 @@
+'''
+net.py - Streaming QuadStick samples between machines over UDP
+
+    Copyright (C) 2014 Simon D. Levy
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+On the pilot's machine:
+
+    controller = Taranis(('Manual', 'Alt-hold', 'Pos-hold'))
+    controller.attach(Sender('sim.example.com'))
+
+    while controller.running():
+        controller.poll()
+
+On the simulator's, in place of the controller:
+
+    controller = NetworkController(('Manual', 'Alt-hold', 'Pos-hold'), headless=True)
+
+    while controller.running():
+        pitch, roll, yaw, throttle, switchval = controller.poll()
+
+Each sample goes in a datagram of its own: magic, sender session, sequence number, the sender's
+timestamp, then pitch, roll, yaw, throttle (floats) and switch value (signed byte), little-endian.
+The receiver keeps the newest sample and drops any that arrive after a later one, or that come
+from a session a restarted sender has since replaced.  If no sample arrives for timeout seconds,
+poll() returns the failsafe sample instead until one does.  Where the system stamps datagrams as
+they arrive (SO_TIMESTAMPNS, on Linux), the jitter estimate uses those stamps, so it doesn't depend
+on how often the receiver polls.
+'''
+
+import os
+import select
+import socket
+import struct
+import sys
+import time
+
+from quadstick import _SampleSource
+
+MAGIC = b'QSN\x01'
+
+PACKET = struct.Struct('<4sIQd4fb')
+
+PORT = 27183
+
+# Socket option for stamping datagrams as they arrive; Linux has it, but Python doesn't always name
+# it, so fall back to the value from asm-generic/socket.h
+SO_TIMESTAMPNS = getattr(socket, 'SO_TIMESTAMPNS', 35 if sys.platform.startswith('linux') else None)
+
+# struct timespec, as SO_TIMESTAMPNS delivers it
+TIMESPEC = struct.Struct('@ll')
+
+class Sender(object):
+    '''
+    Sends samples to a NetworkController at host and port.  Attach it to a controller to send
+    every poll().
+    '''
+
+    def __init__(self, host, port=PORT):
+        '''
+        Creates a new Sender object.
+        '''
+        self.address = (host, port)
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setblocking(False)
+
+        # A new session tells the receiver that sequence numbers start again
+        self.session = struct.unpack('<I', os.urandom(4))[0]
+        self.sequence = 0
+
+        self.buffer = bytearray(PACKET.size)
+
+        # Datagrams sent, and those the network stack refused
+        self.sent = 0
+        self.errors = 0
+
+    def write(self, timestamp, sample, axes=None):
+        '''
+        Sends a sample (pitch, roll, yaw, throttle, switchval) with its timestamp.
+        '''
+        self.sequence += 1
+
+        PACKET.pack_into(self.buffer, 0, MAGIC, self.session, self.sequence, timestamp, sample[0], sample[1],
+                sample[2], sample[3], sample[4])
+
+        # A full buffer or an unreachable receiver loses this sample; the next one may get through
+        try:
+            self.socket.sendto(self.buffer, self.address)
+            self.sent += 1
+        except OSError:
+            self.errors += 1
+
+    def close(self):
+        '''
+        Closes the socket.
+        '''
+        self.socket.close()
+
+
+class NetworkController(_SampleSource):
+    '''
+    A QuadStick whose samples come from a Sender.  Listens on host (every interface by default) and
+    port; with port 0, the system picks one, which is then the port attribute.  Samples are timed
+    by their arrival, like a device's.
+    '''
+
+    # The pilot made the startup gesture on the sending side
+    GESTURE = False
+
+    def __init__(self, switch_labels=('0', '1', '2'), host='', port=PORT, timeout=.25,
+            failsafe=(0., 0., 0., 0., 0), **kwargs):
+        '''
+        Creates a new NetworkController object.  After timeout seconds without a sample, and before
+        the first, poll() returns failsafe: by default, neutral sticks, idle throttle and the first
+        switch position.  Other keyword arguments are passed to QuadStick.
+        '''
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.failsafe = tuple(failsafe)
+
+        _SampleSource.__init__(self, 'Network %s:%d' % (host or '*', port), switch_labels, **kwargs)
+
+    def _init_device(self):
+
+        self._init_state()
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind((self.host, self.port))
+        self.socket.setblocking(False)
+
+        self.port = self.socket.getsockname()[1]
+
+        # One byte to spare shows up datagrams that are too long
+        self.buffer = bytearray(PACKET.size + 1)
+
+        # Ask the system to stamp each datagram as it arrives, where it can
+        self.stamped = SO_TIMESTAMPNS is not None
+
+        if self.stamped:
+            try:
+                self.socket.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+            except OSError:
+                self.stamped = False
+
+        self.ancillary = socket.CMSG_SPACE(TIMESPEC.size) if self.stamped else 0
+
+        self.values = self.failsafe
+
+        # Sender session and newest sequence number accepted, and the sessions it has replaced
+        self.session = None
+        self.sequence = None
+        self.replaced = set()
+
+        # Datagrams accepted, expected from the sequence numbers, arriving after a later one, and
+        # not ours at all
+        self.accepted = 0
+        self.expected = 0
+        self.late = 0
+        self.invalid = 0
+
+        # Interarrival jitter in seconds, estimated as in RTP (RFC 3550), and the latest transit time
+        # on which it is based, which includes the unknown offset between the clocks
+        self.jitter = 0.
+        self.transit = None
+
+        # When the latest sample arrived, by the monotonic clock
+        self.received_at = None
+
+        self.in_failsafe = True
+
+    def _read_device(self):
+
+        buffer = self.buffer
+
+        # System stamps are by the wall clock, and the rest of this class uses the monotonic one
+        offset = time.time() - time.monotonic() if self.stamped else 0.
+
+        while True:
+
+            try:
+                size, arrived = self._receive(offset)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                # Some systems report an earlier send's failure here
+                break
+
+            if size != PACKET.size:
+                self.invalid += 1
+                continue
+
+            magic, session, sequence, sent, pitch, roll, yaw, throttle, switchval = PACKET.unpack_from(buffer)
+
+            if magic != MAGIC:
+                self.invalid += 1
+                continue
+
+            # A straggler from before the sender restarted, which no gap has counted as expected
+            if session in self.replaced:
+                self.expected += 1
+                self.late += 1
+                continue
+
+            # A restarted sender numbers its samples afresh
+            if session != self.session:
+                if self.session is not None:
+                    self.replaced.add(self.session)
+                self.session = session
+                self.sequence = sequence - 1
+                self.transit = None
+
+            if sequence <= self.sequence:
+                self.late += 1
+                continue
+
+            self.expected += sequence - self.sequence
+            self.sequence = sequence
+            self.accepted += 1
+
+            transit = arrived - sent
+
+            if self.transit is not None:
+                self.jitter += (abs(transit - self.transit) - self.jitter) / 16.
+
+            self.transit = transit
+
+            self.values = pitch, roll, yaw, throttle, switchval
+
+            self.received_at = arrived
+
+        self.in_failsafe = self.received_at is None or time.monotonic() - self.received_at > self.timeout
+
+        if self.in_failsafe:
+            self.values = self.failsafe
+
+    def _receive(self, offset):
+
+        # Reads the next datagram into the buffer, and returns its size and when it arrived by the
+        # monotonic clock: as stamped by the system if it can, and otherwise as it is read
+        if not self.stamped:
+            return self.socket.recv_into(self.buffer), time.monotonic()
+
+        size, ancillary, _, _ = self.socket.recvmsg_into([self.buffer], self.ancillary)
+
+        for level, kind, data in ancillary:
+            if level == socket.SOL_SOCKET and kind == SO_TIMESTAMPNS:
+                seconds, nanoseconds = TIMESPEC.unpack_from(data)
+                return size, seconds + nanoseconds * 1e-9 - offset
+
+        return size, time.monotonic()
+
+    def _wait(self):
+
+        # Sleep until a datagram arrives, for at most WAIT seconds
+        select.select([self.socket], [], [], self.WAIT)
+
+    def link_stats(self):
+        '''
+        Returns a dictionary of datagrams accepted, lost, late and invalid, the fraction lost,
+        interarrival jitter in seconds, seconds since the latest sample (None before the first), and
+        whether the failsafe sample is in use.
+        '''
+        lost = max(self.expected - self.accepted - self.late, 0)
+
+        return {
+                'accepted': self.accepted,
+                'lost': lost,
+                'late': self.late,
+                'invalid': self.invalid,
+                'loss': float(lost) / self.expected if self.expected else 0.,
+                'jitter': self.jitter,
+                'age': None if self.received_at is None else time.monotonic() - self.received_at,
+                'failsafe': self.in_failsafe,
+                }
+
+    def close(self):
+        '''
+        Closes the socket.
+        '''
+        self.socket.close()
@@ -0,0 +1,246 @@
+'''
+predict.py - Demands at any moment, from a short history of samples
+
+    Copyright (C) 2014 Simon D. Levy
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+A sample is already old when the physics step uses it, and by a different amount each step.  With
+a history, a controller can give the demands at the step's own time instead:
+
+    controller = ExtremePro3D(('Manual', 'Alt-hold', 'Pos-hold'), clock=sim.time, history=32)
+
+    while controller.running():
+        controller.poll()
+        pitch, roll, yaw, throttle, switchval = controller.sample_at(sim.time())
+
+Samples are timed by the controller's clock when they are captured.  Between samples, demands are
+interpolated; past the newest, they are extrapolated by a least-squares polynomial of order 0, 1 or
+2 through the newest few samples, for at most horizon seconds.  Each new sample is checked against
+what was predicted for it, and errors() gives the statistics, while evaluate() tries the same
+predictor on a recorded session (see quadstick.record.load) with a given latency.
+'''
+
+import collections
+import itertools
+import math
+import operator
+
+# Names of the demands, and the range of each
+DEMANDS = ('pitch', 'roll', 'yaw', 'throttle')
+LIMITS = ((-1., 1.), (-1., 1.), (-1., 1.), (0., 1.))
+
+def _solve(m, v):
+
+    # Cramer's rule for three equations; None if they have no single solution
+    minors = (m[1][1] * m[2][2] - m[1][2] * m[2][1], m[1][0] * m[2][2] - m[1][2] * m[2][0],
+            m[1][0] * m[2][1] - m[1][1] * m[2][0])
+
+    determinant = m[0][0] * minors[0] - m[0][1] * minors[1] + m[0][2] * minors[2]
+
+    if abs(determinant) < 1e-12:
+        return None
+
+    return (
+            (v[0] * minors[0] - m[0][1] * (v[1] * m[2][2] - m[1][2] * v[2]) + m[0][2] * (v[1] * m[2][1] - m[1][1] * v[2]))
+                / determinant,
+            (m[0][0] * (v[1] * m[2][2] - m[1][2] * v[2]) - v[0] * minors[1] + m[0][2] * (m[1][0] * v[2] - v[1] * m[2][0]))
+                / determinant,
+            (m[0][0] * (m[1][1] * v[2] - v[1] * m[2][1]) - m[0][1] * (m[1][0] * v[2] - v[1] * m[2][0]) + v[0] * minors[2])
+                / determinant,
+            )
+
+
+class History(object):
+    '''
+    Keeps the last size samples, to attach to a controller like any other sink.  The predictor fits
+    a polynomial of the given order through the newest window samples (order + 2 by default).
+    '''
+
+    def __init__(self, size=32, order=1, window=None, horizon=.05):
+        '''
+        Creates a new History object.
+        '''
+        if order not in (0, 1, 2):
+            raise ValueError('order must be 0, 1 or 2')
+
+        self.size = size
+        self.order = order
+        self.window = window or order + 2
+        self.horizon = horizon
+
+        self.samples = collections.deque(maxlen=size)
+
+        self.reset_errors()
+
+    def write(self, timestamp, sample, axes=None):
+        '''
+        Adds a sample (pitch, roll, yaw, throttle, switchval) captured at timestamp, after checking it
+        against the prediction for it.
+        '''
+        if self.samples and timestamp > self.samples[-1][0]:
+            self._check(self.sample_at(timestamp), sample)
+
+        self.samples.append((timestamp, tuple(sample)))
+
+    def sample_at(self, t):
+        '''
+        Returns the demands (pitch, roll, yaw, throttle, switchval) at time t, or None if there are no
+        samples yet.  The switch value is that of the newest sample at or before t.
+        '''
+        samples = self.samples
+
+        if not samples:
+            return None
+
+        newest, sample = samples[-1]
+
+        if t >= newest:
+            return self._extrapolate(t) if t > newest else sample
+
+        # Queries are usually for recent times, so search from the newest sample back
+        for k in range(len(samples) - 2, -1, -1):
+
+            before, earlier = samples[k]
+
+            if before <= t:
+                after, later = samples[k+1]
+                fraction = (t - before) / (after - before)
+                return tuple(earlier[j] + fraction * (later[j] - earlier[j]) for j in range(4)) + (earlier[4],)
+
+        return samples[0][1]
+
+    def errors(self):
+        '''
+        Returns a dictionary mapping each demand name to a dictionary of the count, mean absolute
+        error, RMS error and largest absolute error of the predictions checked so far.
+        '''
+        result = {}
+
+        for k, name in enumerate(DEMANDS):
+
+            count = self.counts[k]
+
+            result[name] = {
+                    'count': count,
+                    'mean': self.sums[k] / count if count else 0.,
+                    'rms': math.sqrt(self.squares[k] / count) if count else 0.,
+                    'max': self.largest[k],
+                    }
+
+        return result
+
+    def reset_errors(self):
+        '''
+        Forgets the prediction errors seen so far.
+        '''
+        self.counts = [0] * 4
+        self.sums = [0.] * 4
+        self.squares = [0.] * 4
+        self.largest = [0.] * 4
+
+    def evaluate(self, timestamps, samples, latency=0.):
+        '''
+        Runs this predictor over recorded timestamps and samples, predicting each sample from those
+        captured more than latency seconds before it, and returns the errors as errors() does.  This
+        history is left alone.
+        '''
+        history = History(self.size, self.order, self.window, self.horizon)
+
+        known = 0
+
+        for timestamp, sample in zip(timestamps, samples):
+
+            while known < len(timestamps) and timestamps[known] < timestamp - latency:
+                history.samples.append((timestamps[known], tuple(samples[known])))
+                known += 1
+
+            if history.samples and timestamp > history.samples[-1][0]:
+                history._check(history.sample_at(timestamp), sample)
+
+        return history.errors()
+
+    def _check(self, predicted, sample):
+
+        counts, sums, squares, largest = self.counts, self.sums, self.squares, self.largest
+
+        for k in range(4):
+            error = abs(predicted[k] - sample[k])
+            counts[k] += 1
+            sums[k] += error
+            squares[k] += error * error
+            if error > largest[k]:
+                largest[k] = error
+
+    def _extrapolate(self, t):
+
+        samples = self.samples
+
+        newest, sample = samples[-1]
+
+        count = min(self.window, len(samples))
+
+        recent = list(itertools.islice(samples, len(samples) - count, None))
+
+        # Times relative to the newest sample, in units of the time the samples span, keep the fit well
+        # conditioned
+        span = newest - recent[0][0]
+
+        if count < 2 or span <= 0:
+            return sample
+
+        x = [(timestamp - newest) / span for timestamp, _ in recent]
+
+        ahead = min(t - newest, self.horizon) / span
+
+        # The fitted value is linear in the samples, so work out each one's weight once for all demands
+        weights = self._weights(x, ahead)
+
+        if weights is None:
+            return sample
+
+        columns = list(zip(*[s for _, s in recent]))
+
+        demands = []
+
+        for k in range(4):
+
+            low, high = LIMITS[k]
+
+            demands.append(min(max(sum(map(operator.mul, weights, columns[k])), low), high))
+
+        return demands[0], demands[1], demands[2], demands[3], sample[4]
+
+    def _weights(self, x, ahead):
+
+        n = len(x)
+
+        # A constant fits best at the mean
+        if self.order == 0:
+            return [1. / n] * n
+
+        # A straight line has a closed form
+        if self.order == 1 or n == 2:
+            mean = sum(x) / n
+            spread = sum((xi - mean) ** 2 for xi in x)
+            offset = (ahead - mean) / spread
+            return [1. / n + (xi - mean) * offset for xi in x]
+
+        powers = [(1., xi, xi * xi) for xi in x]
+
+        matrix = [[sum(row[i] * row[j] for row in powers) for j in range(3)] for i in range(3)]
+
+        z = _solve(matrix, [1., ahead, ahead * ahead])
+
+        if z is None:
+            return None
+
+        return [row[0] * z[0] + row[1] * z[1] + row[2] * z[2] for row in powers]
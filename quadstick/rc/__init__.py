@@ -15,17 +15,34 @@ rc/__init__.py - Python class for polling R/C transmitters
 
 '''
 
-import os
-import pygame
 import quadstick
 
 class RC(quadstick.QuadStick):
 
-    def __init__(self, name, switch_labels):
+    def __init__(self, name, switch_labels, calibration=None, **kwargs):
         '''
         Creates a new RC object.  Each subclass must implement the _convert_axis method.
+        If calibration is given, as a Calibration object or the path of a calibration profile,
+        channels are converted through its lookup tables instead (see quadstick.rc.calibration).
+        Other keyword arguments are passed to QuadStick.
         '''
-        quadstick.QuadStick.__init__(self, name, switch_labels)
+        quadstick.QuadStick.__init__(self, name, switch_labels, **kwargs)
+
+        self.channels = [0.] * self.numaxes
+
+        self.throttle_sign = +1
+
+        # For a switch that a saved mapping puts on a button
+        self.buttonstate = 0
+
+        self.calibration = None
+
+        if calibration is not None:
+            from quadstick.rc.calibration import Calibration
+            if not isinstance(calibration, Calibration):
+                calibration = Calibration.load(calibration)
+            calibration.build(self.numaxes, self._convert_axis)
+            self.calibration = calibration
 
     def _get_pitch(self):
 
@@ -41,11 +58,25 @@ class RC(quadstick.QuadStick):
 
     def _get_throttle(self):
 
-        return (self._get_rc_axis(self.throttle_axis) + 1) / 2
+        return (self.throttle_sign * self._get_rc_axis(self.throttle_axis) + 1) / 2
+
+    def _update(self):
+
+        # Convert only the channels that changed since the last snapshot
+        if not self.changed_axes:
+            return
+
+        convert = self._convert_axis if self.calibration is None else self.calibration.convert
+
+        axes = self.axes
+        channels = self.channels
+
+        for index in self.changed_axes:
+            channels[index] = convert(index, axes[index])
 
     def _get_rc_axis(self, index):
         
-        return self._convert_axis(index, quadstick.QuadStick._get_axis(self, index))
+        return self.channels[index]
 
     def _startup_message(self):
 
@@ -0,0 +1,237 @@
+'''
+rc/calibration.py - Lookup-table calibration of R/C transmitter channels
+
+    Copyright (C) 2014 Simon D. Levy
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+Requires NumPy.  A calibration profile is a JSON file giving settings for any of the channels,
+by index; channels not listed pass through the transmitter's own conversion:
+
+    {
+        "channels": {
+            "2": {"center": 0.01, "min": -0.64, "max": 0.68, "deadband": 0.03, "expo": 0.3},
+            "3": {"expo": 0.5, "rate": 0.8}
+        }
+    }
+
+center, min and max are raw stick readings at center and at the ends of travel, and when given
+replace the transmitter's own conversion for that channel.  deadband is the part of each half of
+travel, around center, that reads as zero; the rest is stretched to full scale.  expo blends the
+linear response with a cubic one, softening the sticks around center, and rate scales the result.
+
+Use it through the transmitter:
+
+    controller = DX8(('Manual', 'Alt-hold', 'Pos-hold'), calibration='dx8.json')
+'''
+
+import json
+
+import numpy as np
+
+SETTINGS = {
+        'center': None,
+        'min': None,
+        'max': None,
+        'deadband': 0.,
+        'expo': 0.,
+        'rate': 1.,
+        }
+
+class Calibration(object):
+    '''
+    Maps raw channel values through a lookup table per channel, built once from a profile, with
+    linear interpolation between entries.  All channels of a sample, or all samples of a block,
+    are looked up together.
+    '''
+
+    def __init__(self, profile=None, size=1025):
+        '''
+        Creates a new Calibration object from a profile dictionary, with tables of size entries
+        covering raw values from -1 to +1.
+        '''
+        profile = profile or {}
+
+        self.channels = dict((int(index), self._settings(index, settings))
+                for index, settings in profile.get('channels', {}).items())
+
+        self.size = size
+
+        self.table = None
+
+    @staticmethod
+    def load(path, size=1025):
+        '''
+        Returns a new Calibration object for the profile in the JSON file at path.
+        '''
+        with open(path) as f:
+            return Calibration(json.load(f), size)
+
+    def save(self, path):
+        '''
+        Writes the profile to a JSON file at path.
+        '''
+        with open(path, 'w') as f:
+            json.dump(self.profile(), f, indent=4, sort_keys=True)
+
+    def profile(self):
+        '''
+        Returns the profile as a dictionary.
+        '''
+        return {'channels': dict((str(index), settings) for index, settings in self.channels.items())}
+
+    def build(self, numchannels, convert=None):
+        '''
+        Builds the lookup tables for numchannels channels.  Channels with no center or endpoints in
+        the profile start from convert(index, value), if given, rather than the raw value.
+        '''
+        grid = np.linspace(-1., 1., self.size)
+
+        table = np.empty((numchannels, self.size))
+
+        for index in range(numchannels):
+
+            settings = self.channels.get(index, SETTINGS)
+
+            if settings['center'] is not None or settings['min'] is not None or settings['max'] is not None:
+                values = self._endpoints(grid, settings)
+            elif convert is not None:
+                values = np.array([convert(index, value) for value in grid])
+            else:
+                values = grid.copy()
+
+            table[index] = self._curve(values, settings) if index in self.channels else values
+
+        self.table = table
+
+        # Flattened, so a lookup is a single take with a row offset for each channel
+        self.flat = table.ravel()
+        self.offsets = np.arange(numchannels) * self.size
+
+        # For single samples, NumPy's overhead per call is more than the lookups themselves
+        self.rows = table.tolist()
+
+        self.scale = (self.size - 1) / 2.
+
+    def apply(self, values):
+        '''
+        Returns a list of calibrated values for one sample of raw channel values.
+        '''
+        scale = self.scale
+        last = self.size - 1
+
+        result = []
+
+        for row, value in zip(self.rows, values):
+
+            position = (value + 1.) * scale
+
+            if position <= 0.:
+                result.append(row[0])
+
+            elif position >= last:
+                result.append(row[last])
+
+            else:
+                index = int(position)
+                low = row[index]
+                result.append(low + (position - index) * (row[index + 1] - low))
+
+        return result
+
+    def convert(self, index, value):
+        '''
+        Returns the calibrated value of one channel.
+        '''
+        row = self.rows[index]
+
+        position = (value + 1.) * self.scale
+
+        if position <= 0.:
+            return row[0]
+
+        if position >= self.size - 1:
+            return row[-1]
+
+        lower = int(position)
+
+        return row[lower] + (position - lower) * (row[lower + 1] - row[lower])
+
+    def apply_batch(self, block):
+        '''
+        Returns an array of calibrated values for an array of raw values whose last dimension is the
+        channel, such as one row per sample.
+        '''
+        position = (block + 1.) * self.scale
+        np.maximum(position, 0., out=position)
+        np.minimum(position, self.size - 1., out=position)
+
+        index = position.astype(np.intp)
+        np.minimum(index, self.size - 2, out=index)
+
+        # What's left of position is the fraction of the way to the next entry
+        position -= index
+
+        index += self.offsets
+
+        low = self.flat.take(index)
+        high = self.flat.take(index + 1)
+
+        high -= low
+        high *= position
+        high += low
+
+        return high
+
+    @staticmethod
+    def _settings(index, settings):
+
+        unknown = set(settings) - set(SETTINGS)
+
+        if unknown:
+            raise ValueError('Unknown calibration settings for channel %s: %s' % (index, ', '.join(sorted(unknown))))
+
+        result = dict(SETTINGS)
+        result.update(settings)
+
+        if not 0. <= result['deadband'] < 1.:
+            raise ValueError('Deadband for channel %s must be at least 0 and less than 1' % index)
+
+        if not 0. <= result['expo'] <= 1.:
+            raise ValueError('Expo for channel %s must be between 0 and 1' % index)
+
+        return result
+
+    @staticmethod
+    def _endpoints(grid, settings):
+
+        center = settings['center'] or 0.
+        low = settings['min'] if settings['min'] is not None else -1.
+        high = settings['max'] if settings['max'] is not None else +1.
+
+        values = np.where(grid >= center, (grid - center) / (high - center), (grid - center) / (center - low))
+
+        return np.clip(values, -1., +1.)
+
+    @staticmethod
+    def _curve(values, settings):
+
+        deadband = settings['deadband']
+
+        if deadband:
+            values = np.sign(values) * np.maximum(np.abs(values) - deadband, 0.) / (1. - deadband)
+
+        expo = settings['expo']
+
+        if expo:
+            values = (1. - expo) * values + expo * values ** 3
+
+        return np.clip(values * settings['rate'], -1., +1.)
@@ -22,42 +22,35 @@ class Taranis(RC):
     Class for FrSky Taranis transmitter used with mini-USB cable.  
     You should set up channel mixing such that Channel 5 maps to Switch A and Channel 6 to Switch B.
     '''
+
+    # Built-in mappings by platform
+    MAPPINGS = {
+            'Linux':   {'pitch_axis': 2, 'roll_axis': 1, 'yaw_axis': 3, 'throttle_axis': 0, 'switch_axis': 5},
+            'Windows': {'pitch_axis': 2, 'roll_axis': 1, 'yaw_axis': 5, 'throttle_axis': 0, 'switch_axis': 3},
+            'Darwin':  {'pitch_axis': 0, 'roll_axis': 3, 'yaw_axis': 1, 'throttle_axis': 2, 'switch_axis': 4},
+            }
  
-    def __init__(self, switch_labels):
+    def __init__(self, switch_labels, **kwargs):
         '''
-        Creates a new Taranis object.
+        Creates a new Taranis object.  Keyword arguments are passed to QuadStick.
         '''
 
-        RC.__init__(self, 'Taranis', switch_labels)
-
-        # Default to Linux 
-        self.pitch_axis     = 2
-        self.roll_axis      = 1
-        self.yaw_axis       = 3
-        self.throttle_axis  = 0
-        self.switch_axis    = 5
-
-        if self.platform == 'Windows':
-            self.yaw_axis    = 5
-            self.switch_axis = 3
-            
-        elif self.platform == 'Darwin':
-            self.pitch_axis    = 0
-            self.roll_axis     = 3
-            self.yaw_axis      = 1
-            self.throttle_axis = 2
-            self.switch_axis   = 4
+        RC.__init__(self, 'Taranis', switch_labels, **kwargs)
 
         self.pitch_sign = +1
         self.roll_sign  = -1
         self.yaw_sign   = +1
 
+        self._map(self.MAPPINGS)
+
     def _convert_axis(self, index, value):
 
         return value
 
     def _get_switchval(self):
 
-        switch = RC._get_axis(self, self.switch_axis)
+        # A saved mapping may put the switch on a button instead
+        if self.switch_button is not None:
+            return self._click_switch()
 
-        return 0 if switch < -.5 else (1 if switch < +.5 else 2)
+        return self._position_switch()
@@ -22,41 +22,36 @@ class DX8(RC):
     Class for Spektrum DX8 transmitter used with Wailly PPM->USB cable.
     '''
 
-    def __init__(self, switch_labels):
+    # Built-in mappings by platform
+    MAPPINGS = {
+            'Linux':   {'pitch_axis': 2, 'roll_axis': 1, 'yaw_axis': 5, 'throttle_axis': 0, 'switch_axis': 3},
+            'Windows': {'pitch_axis': 2, 'roll_axis': 1, 'yaw_axis': 3, 'throttle_axis': 0, 'switch_axis': 5},
+            'Darwin':  {'pitch_axis': 0, 'roll_axis': 3, 'yaw_axis': 1, 'throttle_axis': 2, 'switch_axis': 4},
+            }
+
+    def __init__(self, switch_labels, **kwargs):
         '''
-        Creates a new DX8 object.
+        Creates a new DX8 object.  Keyword arguments are passed to QuadStick.
         '''
 
-        RC.__init__(self, 'Spektrum', switch_labels)
-
-        # Default to Linux 
-        self.pitch_axis  = 2
-        self.roll_axis   = 1
-        self.yaw_axis    = 5
-        self.throttle_axis  = 0
-        self.switch_axis = 3
-
-        if self.platform == 'Windows':
-            self.yaw_axis    = 3
-            self.switch_axis = 5
-
-        elif self.platform == 'Darwin':
-            self.pitch_axis  = 0
-            self.roll_axis   = 3
-            self.yaw_axis    = 1
-            self.throttle_axis  = 2
-            self.switch_axis = 4
+        RC.__init__(self, 'Spektrum', switch_labels, **kwargs)
 
         self.pitch_sign = -1
         self.roll_sign  = +1
         self.yaw_sign   = -1
 
+        self._map(self.MAPPINGS)
+
     def _convert_axis(self, index, value):
 
         return value / (.66 if value < 0 else 0.67)
  
     def _get_switchval(self):
 
+        # A saved mapping may put the switch on a button instead
+        if self.switch_button is not None:
+            return self._click_switch()
+
         switch = RC._get_axis(self, self.switch_axis)
 
         return 2 if switch < -.5 else (0 if switch > +.5 else 1)
@@ -0,0 +1,220 @@
+'''
+record.py - Recording and replay of QuadStick sessions
+
+    Copyright (C) 2014 Simon D. Levy
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+To record a session:
+
+    recorder = Recorder('session.qsl')
+    controller.attach(recorder)
+    ...
+    recorder.close()
+
+To replay it, use Replay('session.qsl') in place of the controller, or get everything at once
+with load('session.qsl').
+
+A log is a header (magic, number of raw axes) followed by fixed-size little-endian records:
+timestamp (double), pitch, roll, yaw, throttle (floats), switch value (signed byte), and the
+raw axis values (floats).
+'''
+
+import mmap
+import os
+import struct
+import time
+
+from quadstick import _SampleSource
+
+MAGIC = b'QSLOG\x00\x01\x00'
+
+HEADER = struct.Struct('<8sI')
+
+def _record_struct(numaxes):
+
+    return struct.Struct('<d4fb%df' % numaxes)
+
+
+def load(path):
+    '''
+    Reads a whole log, returning lists of timestamps, samples (pitch, roll, yaw, throttle, switchval)
+    and raw axis value tuples.
+    '''
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    magic, numaxes = HEADER.unpack_from(data, 0)
+
+    if magic != MAGIC:
+        raise ValueError('%s is not a QuadStick log' % path)
+
+    record = _record_struct(numaxes)
+
+    records = list(record.iter_unpack(memoryview(data)[HEADER.size:HEADER.size + (len(data) - HEADER.size)
+        // record.size * record.size]))
+
+    return [r[0] for r in records], [r[1:6] for r in records], [r[6:] for r in records]
+
+
+class Recorder(object):
+    '''
+    Writes timestamped poll() samples and raw axis values to a binary log.  Records are packed into
+    a preallocated buffer and written out when it fills, so recording costs one pack per sample.
+    '''
+
+    def __init__(self, path, buffer_records=4096):
+        '''
+        Creates a new Recorder object writing to path.  The file is created on the first sample.
+        '''
+        self.path = path
+        self.buffer_records = buffer_records
+
+        self.file = None
+        self.count = 0
+
+    def write(self, timestamp, sample, axes):
+        '''
+        Records one sample (pitch, roll, yaw, throttle, switchval) with its timestamp and raw axes.
+        '''
+        if self.file is None:
+            self._open(len(axes))
+
+        self.record.pack_into(self.buffer, self.offset, timestamp, sample[0], sample[1], sample[2], sample[3],
+                sample[4], *axes)
+
+        self.offset += self.record.size
+        self.count += 1
+
+        if self.offset == len(self.buffer):
+            self.flush()
+
+    def flush(self):
+        '''
+        Writes buffered records to the file.
+        '''
+        if self.file is not None and self.offset:
+            self.file.write(memoryview(self.buffer)[:self.offset])
+            self.file.flush()
+            self.offset = 0
+
+    def close(self):
+        '''
+        Flushes and closes the log.
+        '''
+        if self.file is not None:
+            self.flush()
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *args):
+
+        self.close()
+
+    def _open(self, numaxes):
+
+        self.record = _record_struct(numaxes)
+
+        self.buffer = bytearray(self.record.size * self.buffer_records)
+        self.offset = 0
+
+        self.file = open(self.path, 'wb', buffering=0)
+        self.file.write(HEADER.pack(MAGIC, numaxes))
+
+
+class Replay(_SampleSource):
+    '''
+    Plays back a log written by Recorder, with the same interface as any other QuadStick.
+    Samples are served at their recorded pace if realtime is True (scaled by speed), and
+    otherwise as fast as poll() is called.  running() turns False once the log is used up.
+    '''
+
+    # The recorded session was already past its startup
+    GESTURE = False
+
+    def __init__(self, path, switch_labels=('0', '1', '2'), realtime=True, speed=1., **kwargs):
+        '''
+        Creates a new Replay object.  Keyword arguments are passed to QuadStick.
+        '''
+        self.path = path
+        self.realtime = realtime
+        self.speed = speed
+
+        _SampleSource.__init__(self, 'Replay ' + os.path.basename(path), switch_labels, **kwargs)
+
+    def __len__(self):
+
+        return self.count
+
+    def _init_device(self):
+
+        with open(self.path, 'rb') as f:
+            self.log = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, numaxes = HEADER.unpack_from(self.log, 0)
+
+        if magic != MAGIC:
+            raise ValueError('%s is not a QuadStick log' % self.path)
+
+        self._init_state(numaxes)
+
+        self.record = _record_struct(self.numaxes)
+
+        self.count = (len(self.log) - HEADER.size) // self.record.size
+
+        self.index = 0
+
+        self.values = 0., 0., 0., 0., 0
+
+        # Wall-clock time at which the first record is served
+        self.start = None
+
+    def _tick(self):
+
+        # Nothing left to replay, as for a log with no samples at all
+        if self.index >= self.count:
+            self.stopped = True
+            return
+
+        record = self.record.unpack_from(self.log, HEADER.size + self.index * self.record.size)
+
+        self.index += 1
+
+        if self.index == self.count:
+            self.stopped = True
+
+        timestamp = record[0]
+
+        if self.realtime:
+            self._pace(timestamp)
+
+        self.dt = 0. if self.timestamp is None else timestamp - self.timestamp
+        self.timestamp = timestamp
+
+        self.values = record[1:6]
+        self.axes = list(record[6:])
+
+    def _pace(self, timestamp):
+
+        now = time.monotonic()
+
+        if self.start is None:
+            self.start = now - timestamp / self.speed
+
+        delay = self.start + timestamp / self.speed - now
+
+        if delay > 0:
+            time.sleep(delay)
+
@@ -0,0 +1,211 @@
+'''
+sampler.py - Sampling a QuadStick controller at a high rate in the background
+
+    Copyright (C) 2014 Simon D. Levy
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+For a consumer that runs slower than the sticks should be sampled:
+
+    sampler = Sampler(controller, rate_hz=1000)
+
+    while sampler.running():
+        samples = sampler.drain()
+        log(samples['timestamp'], samples['pitch'])
+        ...
+
+A thread polls the controller at rate_hz (see quadstick.scheduler) and writes each sample into a
+preallocated ring buffer.  drain() returns every sample since the last call as one NumPy array of
+DTYPE, so no Python object is made per sample on the consumer's side.  If the consumer falls more
+than capacity samples behind, the oldest are lost, and counted in overflows.
+
+Once the sampler has started, the controller belongs to its thread: don't call the controller's
+own poll() or running() until stop() has returned.  Requires NumPy.
+'''
+
+import threading
+
+import numpy as np
+
+from quadstick.scheduler import Scheduler
+
+DTYPE = np.dtype([
+        ('timestamp', '<f8'),
+        ('pitch', '<f8'),
+        ('roll', '<f8'),
+        ('yaw', '<f8'),
+        ('throttle', '<f8'),
+        ('switchval', '<i4'),
+        ])
+
+class Buffer(object):
+    '''
+    A ring buffer of capacity samples, to attach to a controller like any other sink.
+    '''
+
+    def __init__(self, capacity=8192):
+        '''
+        Creates a new Buffer object.
+        '''
+        self.capacity = capacity
+
+        self.samples = np.zeros(capacity, DTYPE)
+
+        # Samples written and drained since the start; the ring holds the newest of those written
+        self.written = 0
+        self.drained = 0
+
+        # Samples overwritten before they could be drained
+        self.overflows = 0
+
+        self.lock = threading.Lock()
+
+    def __len__(self):
+
+        return min(self.written - self.drained, self.capacity)
+
+    def write(self, timestamp, sample, axes=None):
+        '''
+        Adds a sample (pitch, roll, yaw, throttle, switchval) with its timestamp, overwriting the
+        oldest if the buffer is full.
+        '''
+        with self.lock:
+            self.samples[self.written % self.capacity] = (timestamp, sample[0], sample[1], sample[2], sample[3],
+                    sample[4])
+            self.written += 1
+
+    def drain(self):
+        '''
+        Returns the samples written since the last call, oldest first, as an array of DTYPE.
+        '''
+        with self.lock:
+
+            written = self.written
+            start = max(self.drained, written - self.capacity)
+
+            self.overflows += start - self.drained
+            self.drained = written
+
+            first = start % self.capacity
+            count = written - start
+
+            # The samples may wrap round the end of the ring
+            if first + count <= self.capacity:
+                return self.samples[first:first+count].copy()
+
+            return np.concatenate((self.samples[first:], self.samples[:first+count-self.capacity]))
+
+    def latest(self):
+        '''
+        Returns the newest sample as (timestamp, pitch, roll, yaw, throttle, switchval), or None if
+        there is none yet.  Leaves it to be drained.
+        '''
+        with self.lock:
+            return self.samples[(self.written - 1) % self.capacity].item() if self.written else None
+
+
+class Sampler(object):
+    '''
+    Polls a controller at rate_hz in a thread of its own, keeping the samples in a Buffer of
+    capacity samples.  Starts at once unless start is False.  The thread sleeps until each deadline
+    rather than spinning, since spinning holds the GIL the consumer needs; spin gives the seconds to
+    spin before each deadline instead, for less jitter (see quadstick.scheduler).
+    '''
+
+    def __init__(self, controller, rate_hz=1000, capacity=8192, start=True, spin=0.):
+        '''
+        Creates a new Sampler object.
+        '''
+        self.controller = controller
+
+        self.buffer = Buffer(capacity)
+
+        self.scheduler = Scheduler(controller, rate_hz, spin)
+
+        self.thread = None
+        self.stopping = False
+
+        # Exception that ended the thread, raised again by drain()
+        self.failure = None
+
+        if start:
+            self.start()
+
+    @property
+    def overflows(self):
+        '''
+        Number of samples lost because drain() was not called often enough.
+        '''
+        return self.buffer.overflows
+
+    def start(self):
+        '''
+        Starts polling.
+        '''
+        self.controller.attach(self.buffer)
+
+        self.stopping = False
+
+        self.thread = threading.Thread(target=self._run, name='QuadStick sampler')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        '''
+        Stops polling and waits for the thread to finish.  Samples not yet drained are kept.
+        '''
+        self.stopping = True
+
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+            self.controller.detach(self.buffer)
+
+    def running(self):
+        '''
+        Returns True until the controller stops running or stop() is called.
+        '''
+        return self.thread is not None and self.thread.is_alive()
+
+    def drain(self):
+        '''
+        Returns every sample since the last call as an array of DTYPE, oldest first.  Raises any
+        exception that ended polling, once the samples before it have been drained.
+        '''
+        samples = self.buffer.drain()
+
+        if not len(samples) and self.failure is not None:
+            failure, self.failure = self.failure, None
+            raise failure
+
+        return samples
+
+    def poll(self):
+        '''
+        Returns the newest (pitch, roll, yaw, throttle, switchval) without draining anything, or
+        neutral sticks before the first sample.
+        '''
+        sample = self.buffer.latest()
+
+        return (0., 0., 0., 0., 0) if sample is None else sample[1:]
+
+    def _run(self):
+
+        controller = self.controller
+        scheduler = self.scheduler
+
+        try:
+            while not self.stopping and controller.running():
+                scheduler.wait()
+                controller.poll()
+
+        except Exception as e:
+            self.failure = e
@@ -0,0 +1,144 @@
+'''
+scheduler.py - Fixed-rate polling of QuadStick controllers
+
+    Copyright (C) 2014 Simon D. Levy
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+Instead of polling in a bare loop:
+
+    def step(sample):
+        print('%+3.3f %+3.3f %+3.3f %+3.3f %d' % sample)
+
+    scheduler = Scheduler(controller, 100)
+    scheduler.run(step)
+    print(scheduler.stats())
+'''
+
+import collections
+import time
+
+def _percentile(values, p):
+
+    # values must be sorted
+    return values[min(int(p / 100. * len(values)), len(values)-1)] if values else 0.
+
+class Scheduler(object):
+    '''
+    Polls a controller at a fixed rate.  Deadlines are absolute, so errors in individual waits
+    don't accumulate into drift.  Each wait sleeps until shortly before its deadline and spins
+    the rest of the way, which keeps wake-up jitter well below the operating system's sleep
+    granularity.
+    '''
+
+    def __init__(self, controller, rate_hz, spin=.0005, history=10000):
+        '''
+        Creates a new Scheduler object that polls controller at rate_hz.  The last spin seconds
+        before each deadline are spent spinning rather than sleeping.  Jitter statistics cover the
+        most recent history cycles.
+        '''
+        self.controller = controller
+
+        self.period = 1. / rate_hz
+        self.spin = spin
+
+        # Number of cycles run, deadlines skipped because we were too late for them, and cycles
+        # whose work ran past the next deadline
+        self.cycles = 0
+        self.missed = 0
+        self.overruns = 0
+
+        # Seconds by which each recent wake-up missed its deadline
+        self.lateness = collections.deque(maxlen=history)
+
+        self.deadline = None
+
+    def run(self, callback=None, cycles=None):
+        '''
+        Polls the controller once per period while it is running, passing each sample to callback
+        if given.  Stops after the given number of cycles, if any.
+        '''
+        controller = self.controller
+
+        count = 0
+
+        while controller.running() and (cycles is None or count < cycles):
+
+            self.wait()
+
+            sample = controller.poll()
+
+            if callback is not None:
+                callback(sample)
+
+            count += 1
+
+    def wait(self):
+        '''
+        Waits for the next deadline.
+        '''
+        # Deadlines are in wall time, as sleeps are; a simulator's clock would never reach them
+        clock = time.monotonic
+
+        now = clock()
+
+        if self.deadline is None:
+            self.deadline = now
+
+        elif now > self.deadline:
+            self.overruns += 1
+
+        remaining = self.deadline - now
+
+        if remaining > self.spin:
+            time.sleep(remaining - self.spin)
+
+        while clock() < self.deadline:
+            pass
+
+        now = clock()
+
+        self.lateness.append(now - self.deadline)
+
+        self.cycles += 1
+
+        self.deadline += self.period
+
+        # If we're already past the next deadline, skip the ones we missed instead of bursting
+        if now >= self.deadline:
+            missed = int((now - self.deadline) / self.period) + 1
+            self.missed += missed
+            self.deadline += missed * self.period
+
+    def jitter(self, percentile):
+        '''
+        Returns the given percentile of recent wake-up lateness, in seconds.
+        '''
+        return _percentile(sorted(self.lateness), percentile)
+
+    def stats(self):
+        '''
+        Returns a dictionary of cycle, missed-deadline and overrun counts, and jitter percentiles in
+        seconds.
+        '''
+        lateness = sorted(self.lateness)
+
+        return {
+                'rate': 1. / self.period,
+                'cycles': self.cycles,
+                'missed': self.missed,
+                'overruns': self.overruns,
+                'jitter_p50': _percentile(lateness, 50),
+                'jitter_p90': _percentile(lateness, 90),
+                'jitter_p99': _percentile(lateness, 99),
+                'jitter_p999': _percentile(lateness, 99.9),
+                'jitter_max': lateness[-1] if lateness else 0.,
+                }
@@ -0,0 +1,205 @@
+'''
+shm.py - Sharing QuadStick samples between processes through shared memory
+
+    Copyright (C) 2014 Simon D. Levy
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+In the process that owns the controller:
+
+    publisher = Publisher('quadstick')
+    controller.attach(publisher)
+
+In any number of other processes:
+
+    reader = Reader('quadstick')
+    pitch, roll, yaw, throttle, switchval = reader.poll()
+
+The block holds one sample behind a seqlock: the writer makes the sequence counter odd, writes the
+sample, and makes it even again.  A reader copies the sample between two reads of the counter and
+retries if they differ or are odd, so it never waits on the writer and makes no system calls.
+This relies on stores becoming visible in program order, as they do on x86.  A writer that stops or
+dies in the middle of a write leaves the counter odd, so a reader gives up after RETRIES tries and
+returns the last sample it read instead.
+'''
+
+import struct
+from multiprocessing import shared_memory
+
+# Sequence counter, then timestamp, pitch, roll, yaw, throttle, switch value and sample number
+SEQUENCE = struct.Struct('<Q')
+SAMPLE = struct.Struct('<d4dqQ')
+
+SIZE = SEQUENCE.size + SAMPLE.size
+
+# Tries at a consistent sample before a reader gives up
+RETRIES = 1000
+
+def _attach(name):
+
+    # Attaching shouldn't make this process responsible for unlinking the block
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+
+    # Before Python 3.13 every attachment is tracked, so keep it from being registered
+    except TypeError:
+        from multiprocessing import resource_tracker
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name)
+        finally:
+            resource_tracker.register = register
+
+
+class Publisher(object):
+    '''
+    Publishes samples to a shared-memory block.  Attach it to a controller to publish every poll().
+    '''
+
+    def __init__(self, name=None, create=True):
+        '''
+        Creates a new Publisher object and its shared-memory block.  With no name, a unique one is
+        chosen; either way, it is the publisher's name attribute.  With create False, publishes to
+        an existing block instead, carrying on from the sample already there.
+        '''
+        if create:
+            self.block = shared_memory.SharedMemory(name, create=True, size=SIZE)
+            self.block.buf[:SIZE] = bytes(SIZE)
+        else:
+            self.block = _attach(name)
+
+        self.name = self.block.name
+
+        self.created = create
+
+        # A writer that died mid-write leaves the counter odd; the next write makes it even
+        self.sequence = SEQUENCE.unpack_from(self.block.buf, 0)[0] & ~1
+        self.number = SAMPLE.unpack_from(self.block.buf, SEQUENCE.size)[6]
+
+    def write(self, timestamp, sample, axes=None):
+        '''
+        Publishes a sample (pitch, roll, yaw, throttle, switchval) with its timestamp.
+        '''
+        buf = self.block.buf
+
+        self.number += 1
+
+        SEQUENCE.pack_into(buf, 0, self.sequence + 1)
+
+        SAMPLE.pack_into(buf, SEQUENCE.size, timestamp, sample[0], sample[1], sample[2], sample[3], sample[4],
+                self.number)
+
+        self.sequence += 2
+
+        SEQUENCE.pack_into(buf, 0, self.sequence)
+
+    def recover(self, sample):
+        '''
+        Makes the block consistent again after another writer died in the middle of a write, by
+        writing sample (timestamp, pitch, roll, yaw, throttle, switchval, number) over whatever it left,
+        or with sample None, by emptying it as if nothing had been published.
+        '''
+        buf = self.block.buf
+
+        sequence = SEQUENCE.unpack_from(buf, 0)[0]
+
+        if sequence & 1:
+            SAMPLE.pack_into(buf, SEQUENCE.size, *(sample or (0., 0., 0., 0., 0., 0, 0)))
+            SEQUENCE.pack_into(buf, 0, sequence + 1)
+
+        self.sequence = (sequence + 1) & ~1
+        self.number = SAMPLE.unpack_from(buf, SEQUENCE.size)[6]
+
+    def close(self):
+        '''
+        Closes the shared-memory block, and removes it if this publisher created it.
+        '''
+        self.block.close()
+
+        if self.created:
+            self.block.unlink()
+
+
+class Reader(object):
+    '''
+    Reads the latest sample from a Publisher's shared-memory block.
+    '''
+
+    def __init__(self, name):
+        '''
+        Creates a new Reader object attached to the named block.
+        '''
+        self.block = _attach(name)
+
+        # The sample most recently read and its number, and whether it was new when read
+        self.sample = None
+        self.number = 0
+        self.fresh = False
+
+        # Tries that found the block mid-write, and reads that gave up on it
+        self.retries = 0
+        self.stalls = 0
+
+    def read(self):
+        '''
+        Returns the latest consistent (timestamp, pitch, roll, yaw, throttle, switchval, number), or
+        None if nothing has been published yet.  Sets fresh to False if it is the same sample as
+        the last read, or if the block stayed mid-write for RETRIES tries and the last sample read
+        is returned again.
+        '''
+        buf = self.block.buf
+
+        tries = 0
+
+        while True:
+
+            before = SEQUENCE.unpack_from(buf, 0)[0]
+
+            if not before & 1:
+
+                sample = SAMPLE.unpack_from(buf, SEQUENCE.size)
+
+                if SEQUENCE.unpack_from(buf, 0)[0] == before:
+                    break
+
+            self.retries += 1
+
+            tries += 1
+
+            if tries == RETRIES:
+                self.stalls += 1
+                self.fresh = False
+                return self.sample
+
+        number = sample[6]
+
+        # An emptied block (see Publisher.recover) has nothing new to give
+        self.fresh = number != self.number and number != 0
+        self.number = number
+
+        self.sample = sample if number else None
+
+        return self.sample
+
+    def poll(self):
+        '''
+        Returns the latest (pitch, roll, yaw, throttle, switchval), like QuadStick.poll().
+        '''
+        sample = self.read()
+
+        return (0., 0., 0., 0., 0) if sample is None else sample[1:6]
+
+    def close(self):
+        '''
+        Detaches from the block.
+        '''
+        self.block.close()
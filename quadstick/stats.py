@@ -0,0 +1,191 @@
+'''
+stats.py - Low-overhead timing statistics for QuadStick
+
+    Copyright (C) 2014 Simon D. Levy
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+'''
+
+import sys
+import time
+
+class Histogram(object):
+    '''
+    Counts nanosecond durations in log-linear buckets, HDR-style: values below 2**bits get a
+    bucket each, and above that every power of two is split into 2**(bits-1) buckets, so any
+    value is known to within one part in 2**(bits-1).  Recording is a few integer operations.
+    '''
+
+    def __init__(self, bits=5, limit=2**40):
+        '''
+        Creates a new Histogram object for values up to limit nanoseconds.
+        '''
+        self.bits = bits
+        self.limit = limit
+
+        self.counts = [0] * (self._index(limit) + 1)
+
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def record(self, value):
+        '''
+        Records a duration in nanoseconds.
+        '''
+        index = self._index(value)
+
+        if index >= len(self.counts):
+            index = len(self.counts) - 1
+
+        self.counts[index] += 1
+
+        self.count += 1
+        self.total += value
+
+        if self.min is None or value < self.min:
+            self.min = value
+
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, p):
+        '''
+        Returns the lower bound of the bucket holding the given percentile, in nanoseconds.
+        '''
+        if not self.count:
+            return 0
+
+        rank = p / 100. * self.count
+
+        seen = 0
+
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(max(self._value(index), self.min), self.max)
+
+        return self.max
+
+    def mean(self):
+        '''
+        Returns the mean duration in nanoseconds.
+        '''
+        return float(self.total) / self.count if self.count else 0.
+
+    def reset(self):
+        '''
+        Forgets all recorded durations.
+        '''
+        self.__init__(self.bits, self.limit)
+
+    def summary(self):
+        '''
+        Returns a dictionary of count, and of mean, min, max and percentiles in microseconds.
+        '''
+        return {
+                'count': self.count,
+                'mean': self.mean() / 1e3,
+                'min': (self.min or 0) / 1e3,
+                'p50': self.percentile(50) / 1e3,
+                'p90': self.percentile(90) / 1e3,
+                'p99': self.percentile(99) / 1e3,
+                'p999': self.percentile(99.9) / 1e3,
+                'max': self.max / 1e3,
+                }
+
+    def _index(self, value):
+
+        bits = self.bits
+
+        if value < (1 << bits):
+            return value
+
+        shift = value.bit_length() - bits
+
+        return (1 << bits) + ((shift - 1) << (bits - 1)) + (value >> shift) - (1 << (bits - 1))
+
+    def _value(self, index):
+
+        bits = self.bits
+
+        if index < (1 << bits):
+            return index
+
+        index -= 1 << bits
+
+        shift = (index >> (bits - 1)) + 1
+
+        return ((index & ((1 << (bits - 1)) - 1)) + (1 << (bits - 1))) << shift
+
+
+class Profiler(object):
+    '''
+    Keeps a Histogram of durations for each named stage, in the order stages were first seen.
+    '''
+
+    def __init__(self, dump_interval=None, stream=None):
+        '''
+        Creates a new Profiler object.  If dump_interval is given, dump() is called on stream every
+        dump_interval seconds by whoever calls tick().
+        '''
+        self.histograms = {}
+
+        self.dump_interval = dump_interval
+        self.stream = stream
+
+        self.next_dump = time.monotonic() + dump_interval if dump_interval else None
+
+    def record(self, stage, value):
+        '''
+        Records a duration in nanoseconds for the given stage.
+        '''
+        histogram = self.histograms.get(stage)
+
+        if histogram is None:
+            histogram = self.histograms[stage] = Histogram()
+
+        histogram.record(value)
+
+    def tick(self):
+        '''
+        Dumps statistics if the dump interval has passed.
+        '''
+        if self.next_dump is not None and time.monotonic() >= self.next_dump:
+            self.dump()
+            self.next_dump += self.dump_interval
+
+    def stats(self):
+        '''
+        Returns a dictionary mapping each stage to its Histogram summary.
+        '''
+        return dict((stage, histogram.summary()) for stage, histogram in list(self.histograms.items()))
+
+    def reset(self):
+        '''
+        Forgets all recorded durations.
+        '''
+        self.histograms = {}
+
+    def dump(self, stream=None):
+        '''
+        Writes a table of stage statistics, in microseconds, to stream.
+        '''
+        stream = stream or self.stream or sys.stderr
+
+        stream.write('%-10s %10s %9s %9s %9s %9s %9s\n' % ('stage', 'count', 'mean', 'p50', 'p99', 'p999', 'max'))
+
+        for stage, summary in self.stats().items():
+            stream.write('%-10s %10d %9.2f %9.2f %9.2f %9.2f %9.2f\n' % (stage, summary['count'], summary['mean'],
+                summary['p50'], summary['p99'], summary['p999'], summary['max']))
+
+        stream.flush()
@@ -0,0 +1,363 @@
+'''
+synthetic.py - A QuadStick controller driven by scripted input profiles
+
+    Copyright (C) 2014 Simon D. Levy
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+For load-testing a simulator or autopilot without a pilot:
+
+    controller = Synthetic(pitch=Sine(.5, 2), roll=RandomWalk(), throttle=ThrottleCycle(8),
+            rate_hz=1000, seed=1, headless=True)
+
+    while controller.running():
+        pitch, roll, yaw, throttle, switchval = controller.poll()
+
+or, for batch consumers, a block of samples at a time as NumPy arrays:
+
+    timestamps, samples = controller.block(100000)
+
+Each profile is a function of time, and random ones are seeded from seed, so the same arguments
+always give the same samples.  With rate_hz, samples are rate_hz apart in time however fast they
+are taken, and poll() gives exactly the samples block() would; without it, they follow the clock.
+Before the profiles begin, the throttle makes one cycle from idle to full and back over startup
+seconds, which is the startup gesture poll() waits for.  Requires NumPy.
+'''
+
+import copy
+import math
+import time
+
+import numpy as np
+
+from quadstick import QuadStick, _SampleSource
+
+# Samples worked out at a time for poll() when rate_hz is given
+CHUNK = 1024
+
+class Profile(object):
+    '''
+    A value as a function of time in seconds, from when the profiles begin.
+    '''
+
+    def start(self, seed):
+        '''
+        Starts afresh, seeding any randomness from a numpy.random.SeedSequence.
+        '''
+        return
+
+    def value(self, t):
+        '''
+        Returns the value at time t.
+        '''
+        return float(self.values(np.array([float(t)]))[0])
+
+    def values(self, times):
+        '''
+        Returns an array of the values at an array of times.
+        '''
+        raise NotImplementedError
+
+
+class Constant(Profile):
+    '''
+    Holds a value.
+    '''
+
+    def __init__(self, value=0.):
+
+        self.constant = value
+
+    def values(self, times):
+
+        return np.full(len(times), float(self.constant))
+
+
+class Step(Profile):
+    '''
+    Steps from before to after at time at.
+    '''
+
+    def __init__(self, at=1., before=0., after=1.):
+
+        self.at = at
+        self.before = before
+        self.after = after
+
+    def values(self, times):
+
+        return np.where(times >= self.at, float(self.after), float(self.before))
+
+
+class Sine(Profile):
+    '''
+    Sine wave with an amplitude, a frequency in Hz, an offset and a phase in radians.
+    '''
+
+    def __init__(self, amplitude=1., frequency=1., offset=0., phase=0.):
+
+        self.amplitude = amplitude
+        self.frequency = frequency
+        self.offset = offset
+        self.phase = phase
+
+    def values(self, times):
+
+        return self.offset + self.amplitude * np.sin(2 * math.pi * self.frequency * times + self.phase)
+
+
+class Chirp(Profile):
+    '''
+    Sine wave whose frequency sweeps linearly from low to high Hz over duration seconds, then
+    sweeps again.
+    '''
+
+    def __init__(self, amplitude=1., low=.1, high=10., duration=10., offset=0.):
+
+        self.amplitude = amplitude
+        self.low = low
+        self.high = high
+        self.duration = duration
+        self.offset = offset
+
+    def values(self, times):
+
+        t = np.mod(times, self.duration)
+
+        phase = 2 * math.pi * (self.low * t + (self.high - self.low) * t * t / (2 * self.duration))
+
+        return self.offset + self.amplitude * np.sin(phase)
+
+
+class RandomWalk(Profile):
+    '''
+    Gaussian random walk that moves sigma per square-root second on average, reflected off low and
+    high, starting halfway between them.  Steps are taken every interval seconds, and joined by
+    straight lines.  Seeded by seed if given, and otherwise by the controller.  Every step is kept,
+    at eight bytes each, so values at any time can be asked for again.
+    '''
+
+    def __init__(self, sigma=.5, interval=.02, low=-1., high=1., seed=None):
+
+        self.sigma = sigma
+        self.interval = interval
+        self.low = low
+        self.high = high
+        self.seed = seed
+
+        self.start(None)
+
+    def start(self, seed):
+
+        self.rng = np.random.default_rng(self.seed if self.seed is not None else seed)
+
+        # Reflected positions at each step, of which the first count are drawn so far, and the
+        # latest position before reflection, to carry on from
+        self.position = (self.low + self.high) / 2.
+        self.knots = np.full(CHUNK + 1, self.position)
+        self.count = 1
+
+    def values(self, times):
+
+        if not len(times):
+            return np.empty(0)
+
+        last = int(np.max(times) / self.interval) + 2
+
+        # Steps are drawn in fixed-size batches, so the walk doesn't depend on how it's sampled, and
+        # each is reflected once, when drawn
+        while self.count < last:
+
+            steps = self.rng.normal(0., self.sigma * math.sqrt(self.interval), CHUNK)
+
+            positions = self.position + np.cumsum(steps)
+            self.position = positions[-1]
+
+            # Room for twice as many, so that growing costs no more per step however long the walk
+            if self.count + CHUNK > len(self.knots):
+                self.knots = np.concatenate((self.knots[:self.count], np.empty(len(self.knots))))
+
+            self.knots[self.count:self.count+CHUNK] = self._reflect(positions)
+            self.count += CHUNK
+
+        # Only the steps around the times asked for
+        first = max(int(np.min(times) / self.interval), 0)
+
+        return np.interp(times / self.interval, np.arange(first, last), self.knots[first:last])
+
+    def _reflect(self, positions):
+
+        span = self.high - self.low
+
+        folded = np.mod(positions - self.low, 2 * span)
+
+        return self.low + np.where(folded > span, 2 * span - folded, folded)
+
+
+class ThrottleCycle(Profile):
+    '''
+    Triangle wave from low to high and back every period seconds, starting at low.
+    '''
+
+    def __init__(self, period=4., low=0., high=1.):
+
+        self.period = period
+        self.low = low
+        self.high = high
+
+    def values(self, times):
+
+        phase = np.mod(times / self.period, 1.)
+
+        return self.low + (self.high - self.low) * (1. - np.abs(2 * phase - 1.))
+
+
+class Synthetic(_SampleSource):
+    '''
+    A QuadStick whose pitch, roll, yaw, throttle and switch follow Profile objects, which default
+    to neutral sticks, idle throttle and the first switch position.  The switch profile's value is
+    rounded to a switch position.  The profiles given are copied, so they can be shared.
+    '''
+
+    def __init__(self, switch_labels=('0', '1', '2'), pitch=None, roll=None, yaw=None, throttle=None,
+            switch=None, rate_hz=None, seed=0, startup=1., **kwargs):
+        '''
+        Creates a new Synthetic object.  With startup None or zero, the profiles begin at once.
+        Keyword arguments are passed to QuadStick.
+        '''
+        profiles = [profile or Constant() for profile in (pitch, roll, yaw, throttle, switch)]
+
+        self.profiles = copy.deepcopy(profiles)
+
+        for profile, sequence in zip(self.profiles, np.random.SeedSequence(seed).spawn(5)):
+            profile.start(sequence)
+
+        self.rate_hz = rate_hz
+        self.startup = startup
+
+        _SampleSource.__init__(self, 'Synthetic', switch_labels, **kwargs)
+
+        if not startup:
+            self.ready = True
+
+    def _init_device(self):
+
+        _SampleSource._init_device(self)
+
+        # Samples taken, and the first taken once the profiles began, with its time in seconds
+        self.index = 0
+        self.origin = None
+        self.begun = None
+
+        # Wall-clock time of the first sample, without rate_hz
+        self.start = None
+
+        # Samples for poll() worked out ahead, and the profile step of the first
+        self.chunk = None
+        self.chunk_start = 0
+
+    def generate(self, times):
+        '''
+        Returns the samples at an array of profile times as an array with a row per sample of pitch,
+        roll, yaw, throttle and switch value, without filters.
+        '''
+        samples = np.empty((len(times), 5))
+
+        for k, profile in enumerate(self.profiles):
+            samples[:, k] = profile.values(times)
+
+        np.clip(np.rint(samples[:, 4]), 0, len(self.switch_labels) - 1, out=samples[:, 4])
+
+        return samples
+
+    def block(self, count):
+        '''
+        Returns the next count samples, as an array of timestamps and an array from generate(),
+        skipping the startup gesture.  Needs rate_hz.
+        '''
+        if not self.rate_hz:
+            raise ValueError('block() needs rate_hz')
+
+        self.ready = True
+
+        if self.origin is None:
+            self.origin = self.index
+            self.begun = self.index / self.rate_hz
+
+        steps = np.arange(count) + (self.index - self.origin)
+
+        samples = self.generate(steps / self.rate_hz)
+
+        self.index += count
+
+        timestamps = (steps + self.origin) / self.rate_hz
+
+        if count:
+            self.dt = 1. / self.rate_hz
+            self.timestamp = timestamps[-1]
+
+        return timestamps, samples
+
+    def _tick(self):
+
+        if self.rate_hz:
+            t = self.index / self.rate_hz
+            self.dt = 0. if self.timestamp is None else 1. / self.rate_hz
+            self.timestamp = t
+
+        else:
+            QuadStick._tick(self)
+            if self.start is None:
+                self.start = self.timestamp
+            t = self.timestamp - self.start
+
+        self.index += 1
+
+        if not self.ready:
+            self.values = 0., 0., 0., self._cycle(t), 0
+            return
+
+        if self.origin is None:
+            self.origin = self.index - 1
+            self.begun = t
+
+        # Either way, generate() rounds and clips the switch value
+        if not self.rate_hz:
+            values = self.generate(np.array([t - self.begun])).tolist()[0]
+
+        else:
+
+            step = self.index - 1 - self.origin
+
+            if self.chunk is None or not self.chunk_start <= step < self.chunk_start + CHUNK:
+                self.chunk_start = step
+                self.chunk = self.generate((step + np.arange(CHUNK)) / self.rate_hz).tolist()
+
+            values = self.chunk[step - self.chunk_start]
+
+        self.values = values[0], values[1], values[2], values[3], int(values[4])
+
+    def _startup_message(self):
+
+        return 'Cycling throttle to begin.'
+
+    def _cycle(self, t):
+
+        # One throttle cycle from idle to full and back over the startup period
+        phase = t / self.startup
+
+        return max(1. - abs(2 * phase - 1.), 0.) if phase < 1. else 0.
+
+    def _wait(self):
+
+        # Without rate_hz, give the clock time to move on; with it, every sample is a step in time
+        if not self.rate_hz:
+            time.sleep(.01)
@@ -0,0 +1,342 @@
+'''
+worker.py - Sampling a QuadStick controller in a process of its own
+
+    Copyright (C) 2014 Simon D. Levy
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+A simulator whose physics holds the GIL for milliseconds at a time can't poll often enough to
+catch every stick movement.  A Worker opens the controller in a child process, which polls it
+at a steady rate however busy the simulator is, and publishes each sample through shared memory
+(see quadstick.shm):
+
+    controller = Worker(Taranis, ('Manual', 'Alt-hold', 'Pos-hold'), rate_hz=500)
+
+    while controller.running():
+        pitch, roll, yaw, throttle, switchval = controller.poll()
+
+The class and its arguments are passed to the child, so they must be picklable.  The HUD, if any,
+belongs to the child.  If the child dies or stops publishing, it is replaced, without asking for
+the startup gesture again; meanwhile poll() returns the last sample and healthy is False.  The child
+exits if the parent does.
+'''
+
+import multiprocessing
+import sys
+import time
+
+from quadstick.shm import Publisher, Reader
+
+# Seconds between the child's checks on its parent and for commands
+CHILD_CHECK = .25
+
+def _serve(factory, args, kwargs, name, rate_hz, ready, connection):
+
+    controller = factory(*args, **kwargs)
+
+    # A replacement child takes over from one that already saw the startup gesture
+    if ready:
+        controller.ready = True
+
+    publisher = Publisher(name, create=False)
+    controller.attach(publisher)
+
+    scheduler = None
+
+    if rate_hz:
+        from quadstick.scheduler import Scheduler
+        scheduler = Scheduler(controller, rate_hz)
+
+    parent = multiprocessing.parent_process()
+
+    next_check = 0.
+
+    while controller.running():
+
+        if scheduler is not None:
+            scheduler.wait()
+
+        controller.poll()
+
+        now = time.monotonic()
+
+        if now < next_check:
+            continue
+
+        next_check = now + CHILD_CHECK
+
+        if parent is not None and not parent.is_alive():
+            break
+
+        while connection.poll():
+
+            command, argument = connection.recv()
+
+            if command == 'stop':
+                controller.stop()
+
+            elif command == 'message':
+                controller.message(argument)
+
+            elif command == 'clear':
+                controller.clear()
+
+            elif command == 'error':
+                _show_error(controller, argument)
+                controller.stop()
+
+    connection.send(('stopped', None))
+
+    publisher.close()
+
+def _show_error(controller, text):
+
+    # Shown on the HUD until ESC, like QuadStick.error(); the parent has already written it to stderr
+    if controller.hud is None:
+        return
+
+    controller.renderer.close()
+
+    controller.hud.error(text)
+
+    while controller.running():
+        controller._wait()
+
+
+class Worker(object):
+    '''
+    Stands in for a controller of class factory that runs in a child process.  Other arguments are
+    passed to factory, except these: the child polls at rate_hz (as fast as it can if None), is
+    replaced if it publishes nothing for timeout seconds once started, and is replaced at most
+    max_restarts times (without limit if None), no more often than every restart_delay seconds.
+    '''
+
+    def __init__(self, factory, *args, **kwargs):
+        '''
+        Creates a new Worker object and starts its child process.
+        '''
+        self.rate_hz = kwargs.pop('rate_hz', 500.)
+        self.timeout = kwargs.pop('timeout', 1.)
+        self.max_restarts = kwargs.pop('max_restarts', None)
+        self.restart_delay = kwargs.pop('restart_delay', .5)
+
+        self.factory = factory
+        self.args = args
+        self.kwargs = kwargs
+
+        self.context = multiprocessing.get_context('spawn')
+
+        # The block outlives each child, so a replacement carries on where the last one stopped
+        self.publisher = Publisher()
+        self.reader = Reader(self.publisher.name)
+
+        # Last sample read, as (timestamp, pitch, roll, yaw, throttle, switchval, number)
+        self.latest = None
+
+        # Timestamp of the latest sample, in the child's monotonic clock, which is also ours
+        self.timestamp = None
+
+        self.restarts = 0
+        self.healthy = False
+        self.stopped = False
+        self.finished = False
+
+        self.process = None
+        self.connection = None
+
+        self.next_check = 0.
+        self.restart_at = 0.
+
+        self._start()
+
+    def poll(self):
+        '''
+        Returns the latest (pitch, roll, yaw, throttle, switchval) from the child, waiting for the
+        first one if need be.
+        '''
+        self._check()
+
+        sample = self._read()
+
+        while sample is None and not self.finished:
+            time.sleep(.001)
+            self._check()
+            sample = self._read()
+
+        if sample is None:
+            return 0., 0., 0., 0., 0
+
+        return sample[1:6]
+
+    def running(self):
+        '''
+        Returns True until the child's controller stops running, stop() is called, or the child has
+        been restarted max_restarts times and fails again.
+        '''
+        self._check()
+
+        return not self.finished and not self.stopped
+
+    def stop(self):
+        '''
+        Makes running() return False, and asks the child to finish.
+        '''
+        self.stopped = True
+
+        self._send('stop')
+
+    def message(self, msg):
+        '''
+        Displays a message on the child's HUD, or prints it if there is none.
+        '''
+        self._send('message', msg)
+
+    def clear(self):
+        '''
+        Clears the child's HUD.
+        '''
+        self._send('clear')
+
+    def error(self):
+        '''
+        Writes the most recent exception to stderr and shows it on the child's HUD, if any, until
+        ESC is hit there, then exits.
+        '''
+        import traceback
+
+        text = traceback.format_exc()
+
+        sys.stderr.write(text)
+
+        self._send('error', text)
+
+        if self.process is not None:
+            self.process.join()
+
+        self.close()
+
+        sys.exit(1)
+
+    def close(self):
+        '''
+        Stops the child and releases the shared memory.
+        '''
+        if self.process is not None:
+
+            self._send('stop')
+
+            self.process.join(self.timeout)
+
+            if self.process.is_alive():
+                self.process.kill()
+                self.process.join()
+
+            self.process = None
+
+        self.reader.close()
+        self.publisher.close()
+
+    def _send(self, command, argument=None):
+
+        try:
+            self.connection.send((command, argument))
+        except (OSError, ValueError):
+            pass
+
+    def _start(self):
+
+        self.connection, child = self.context.Pipe()
+
+        # Only the first child asks for the startup gesture
+        ready = self.latest is not None
+
+        self.process = self.context.Process(target=_serve, name='QuadStick worker', args=(self.factory,
+            self.args, self.kwargs, self.publisher.name, self.rate_hz, ready, child))
+        self.process.daemon = True
+        self.process.start()
+
+        child.close()
+
+        self.fresh_at = None
+        self.started_at = time.monotonic()
+
+    def _read(self):
+
+        sample = self.reader.read()
+
+        if self.reader.fresh:
+            self.latest = sample
+            self.timestamp = sample[0]
+            self.fresh_at = time.monotonic()
+
+        return sample
+
+    def _check(self):
+
+        now = time.monotonic()
+
+        if now < self.next_check or self.finished:
+            return
+
+        self.next_check = now + .05
+
+        process = self.process
+
+        # Whether the child is still publishing shows in the block, however long since the last poll()
+        self._read()
+
+        if not process.is_alive():
+
+            # A child that died mid-write left a torn sample behind, so mend it before it's read again
+            self.publisher.recover(self.latest)
+
+            # A child that says it finished is done; any other exit is a crash
+            try:
+                finished = self.connection.poll() and self.connection.recv()[0] == 'stopped'
+            except (EOFError, OSError):
+                finished = False
+
+            if finished or self.stopped:
+                self.finished = True
+                self.healthy = False
+                return
+
+            self._restart(now)
+
+        # A child that has published and then fallen silent is stuck
+        elif self.fresh_at is not None and now - self.fresh_at > self.timeout:
+            self._restart(now)
+
+        else:
+            self.healthy = self.fresh_at is not None
+
+    def _restart(self, now):
+
+        self.healthy = False
+
+        if now < self.restart_at:
+            return
+
+        if self.max_restarts is not None and self.restarts >= self.max_restarts:
+            self.finished = True
+            return
+
+        # A stuck child may not even be taking signals, so it can't be asked to finish
+        self.process.kill()
+        self.process.join()
+
+        # A child killed mid-write leaves a torn sample behind
+        self.publisher.recover(self.latest)
+
+        self.restarts += 1
+        self.restart_at = now + self.restart_delay
+
+        self._start()
@@ -25,6 +25,7 @@ from setuptools import setup
 setup (name = 'PyQuadStick',
     version = '0.1',
     install_requires = ['pygame'],
+    extras_require = {'calibration': ['numpy'], 'synthetic': ['numpy'], 'sampler': ['numpy']},
     description = 'Quadrotor Flight Control in Python',
     packages = ['quadstick', 'quadstick.rc'],
     author='Simon D. Levy',
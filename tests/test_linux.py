@@ -0,0 +1,126 @@
+'''
+test_linux.py - Replays canned joydev and evdev events through a FIFO
+
+Copyright (C) 2014 Simon D. Levy
+
+This code is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as 
+published by the Free Software Foundation, either version 3 of the 
+License, or (at your option) any later version.
+
+This code is distributed in the hope that it will be useful,     
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License 
+along with this code.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+if not sys.platform.startswith('linux'):
+    raise unittest.SkipTest('joydev and evdev are Linux only')
+
+from quadstick.linux import Joydev, Evdev, JS_EVENT, JS_EVENT_AXIS, JS_EVENT_BUTTON, JS_EVENT_INIT, \
+        INPUT_EVENT, EV_ABS, EV_KEY
+
+# Codes of the first two absolute axes and the first joystick button
+ABS_X, ABS_Y, BTN_TRIGGER = 0x00, 0x01, 0x120
+
+class _FifoTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.directory = tempfile.mkdtemp()
+
+        self.path = os.path.join(self.directory, 'device')
+
+        os.mkfifo(self.path)
+
+        self.writer = None
+
+    def tearDown(self):
+
+        if self.writer is not None:
+            os.close(self.writer)
+
+        shutil.rmtree(self.directory)
+
+    def _write(self, data):
+
+        # The device opens the FIFO for reading first, so opening it for writing doesn't block
+        if self.writer is None:
+            self.writer = os.open(self.path, os.O_WRONLY)
+
+        os.write(self.writer, data)
+
+class TestJoydev(_FifoTest):
+
+    def test_replay(self):
+
+        device = Joydev(self.path, numaxes=2, numbuttons=1)
+
+        self.assertEqual(device.snapshot(), ([0., 0.], [0]))
+
+        self._write(JS_EVENT.pack(0, 32767, JS_EVENT_AXIS | JS_EVENT_INIT, 0) +
+                JS_EVENT.pack(1, -32768, JS_EVENT_AXIS, 1) +
+                JS_EVENT.pack(2, 1, JS_EVENT_BUTTON, 0))
+
+        self.assertEqual(device.snapshot(), ([1., -1.], [1]))
+
+        device.close()
+
+    def test_split_record(self):
+
+        device = Joydev(self.path, numaxes=1, numbuttons=0)
+
+        event = JS_EVENT.pack(0, -16384, JS_EVENT_AXIS, 0)
+
+        # Half a record is kept until the rest arrives
+        self._write(event[:3])
+        self.assertEqual(device.snapshot(), ([0.], []))
+
+        self._write(event[3:])
+        self.assertEqual(device.snapshot(), ([-.5], []))
+
+        device.close()
+
+class TestEvdev(_FifoTest):
+
+    def test_codes_without_absinfo(self):
+
+        # A FIFO has no ioctls, so each axis falls back to the default range, centred
+        device = Evdev(self.path, axis_codes=[ABS_X, ABS_Y], button_codes=[BTN_TRIGGER])
+
+        axes, buttons = device.snapshot()
+
+        self.assertEqual(len(axes), 2)
+        for axis in axes:
+            self.assertAlmostEqual(axis, 0., places=4)
+        self.assertEqual(buttons, [0])
+
+        self._write(INPUT_EVENT.pack(0, 0, EV_ABS, ABS_X, 32767) +
+                INPUT_EVENT.pack(0, 0, EV_ABS, ABS_Y, -32768) +
+                INPUT_EVENT.pack(0, 0, EV_KEY, BTN_TRIGGER, 1))
+
+        self.assertEqual(device.snapshot(), ([1., -1.], [1]))
+
+        device.close()
+
+    def test_absinfo(self):
+
+        device = Evdev(self.path, axis_codes=[ABS_X], button_codes=[], absinfo={ABS_X: (0, 255)})
+
+        self._write(INPUT_EVENT.pack(0, 0, EV_ABS, ABS_X, 255))
+
+        self.assertEqual(device.snapshot(), ([1.], []))
+
+        device.close()
+
+if __name__ == '__main__':
+    unittest.main()